@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import ipaddress
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tornet.geoip import GeoIPIndex, GEOIP_FILE, GEOIP6_FILE
+
+COUNTRIES = ["US", "DE", "NL", "FR", "GB", "SE", "CH", "JP", "CA", "RU"]
+
+def write_synthetic(directory, v4_ranges, v6_ranges, seed=1):
+    rng = random.Random(seed)
+    geoip_file = os.path.join(directory, "geoip")
+    geoip6_file = os.path.join(directory, "geoip6")
+    step = (1 << 32) // v4_ranges
+    with open(geoip_file, "w") as f:
+        f.write("# synthetic geoip\n")
+        for i in range(v4_ranges):
+            low = i * step
+            f.write(f"{low},{low + step - 1},{rng.choice(COUNTRIES)}\n")
+    step = (1 << 128) // v6_ranges
+    with open(geoip6_file, "w") as f:
+        f.write("# synthetic geoip6\n")
+        for i in range(v6_ranges):
+            low = i * step
+            f.write(f"{ipaddress.IPv6Address(low)},{ipaddress.IPv6Address(low + step - 1)},{rng.choice(COUNTRIES)}\n")
+    return geoip_file, geoip6_file
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - start
+
+def measure_memory(func):
+    tracemalloc.start()
+    result = func()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+def lookups_per_second(index, addresses):
+    start = time.perf_counter()
+    for address in addresses:
+        index.country(address)
+    return len(addresses) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the offline GeoIP index")
+    parser.add_argument("--real", action="store_true", help="Use Tor's installed geoip files instead of synthetic data")
+    parser.add_argument("--v4-ranges", type=int, default=200000)
+    parser.add_argument("--v6-ranges", type=int, default=60000)
+    parser.add_argument("--lookups", type=int, default=200000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        if args.real:
+            geoip_file, geoip6_file = GEOIP_FILE, GEOIP6_FILE
+        else:
+            geoip_file, geoip6_file = write_synthetic(directory, args.v4_ranges, args.v6_ranges)
+        cache_file = os.path.join(directory, "geoip.cache")
+
+        index, parse_time = timed(lambda: GeoIPIndex.load(geoip_file, geoip6_file, cache_file))
+        cached, cached_time = timed(lambda: GeoIPIndex.load(geoip_file, geoip6_file, cache_file))
+        _, parse_current, parse_peak = measure_memory(lambda: GeoIPIndex.from_files(geoip_file, geoip6_file))
+        _, cached_current, _ = measure_memory(lambda: GeoIPIndex.load(geoip_file, geoip6_file, cache_file))
+
+        rng = random.Random(2)
+        v4 = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(args.lookups)]
+        v6 = [str(ipaddress.IPv6Address(rng.getrandbits(128))) for _ in range(args.lookups // 4)]
+        for address in v4[:1000] + v6[:1000]:
+            assert index.country(address) == cached.country(address)
+
+        print(json.dumps({
+            "benchmark": "geoip",
+            "ranges": len(index),
+            "parse_load_seconds": round(parse_time, 4),
+            "cached_load_seconds": round(cached_time, 6),
+            "parsed_index_bytes": parse_current,
+            "parse_peak_bytes": parse_peak,
+            "cached_index_bytes": cached_current,
+            "cache_file_bytes": os.path.getsize(cache_file),
+            "ipv4_lookups_per_second": round(lookups_per_second(cached, v4)),
+            "ipv6_lookups_per_second": round(lookups_per_second(cached, v6)),
+        }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import FakeTor, ECHO_PORT, socks_connect, summarize, timed_calls
+from tornet.socks_server import RotatingSocksServer, RotationPolicy
+
+CHUNK = 65536
+
+class ProxyThread:
+    def __init__(self, server):
+        self.server = server
+        self.loop = asyncio.new_event_loop()
+        self.task = None
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        asyncio.set_event_loop(self.loop)
+        self.task = self.loop.create_task(self.server.serve_forever())
+        try:
+            self.loop.run_until_complete(self.task)
+        except asyncio.CancelledError:
+            pass
+        pending = asyncio.all_tasks(self.loop)
+        self.loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        self.loop.close()
+
+    def __enter__(self):
+        self.thread.start()
+        while self.server._sock is None or self.server.port == 0:
+            time.sleep(0.01)
+        return self.server
+
+    def __exit__(self, *exc):
+        self.loop.call_soon_threadsafe(self.task.cancel)
+        self.thread.join(5)
+
+def round_trip(port, payload_bytes, username=None, password=None):
+    sock = socks_connect(port, ECHO_PORT, username=username, password=password)
+    chunk = os.urandom(CHUNK)
+    try:
+        remaining = payload_bytes
+        while remaining > 0:
+            size = min(CHUNK, remaining)
+            sock.sendall(chunk[:size])
+            received = 0
+            while received < size:
+                data = sock.recv(size - received)
+                if not data:
+                    raise ConnectionError("echo closed early")
+                received += len(data)
+            remaining -= size
+    finally:
+        sock.close()
+
+def throughput(port, payload_mb, concurrency, **credentials):
+    payload = int(payload_mb * 1024 * 1024)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(round_trip, port, payload, **credentials) for _ in range(concurrency)]:
+            future.result()
+    elapsed = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "payload_mb": payload_mb,
+        "seconds": round(elapsed, 4),
+        "mb_per_second": round(2 * payload_mb * concurrency / elapsed, 1),
+    }
+
+def connect_latency(port, runs, **credentials):
+    return summarize(timed_calls(lambda: socks_connect(port, ECHO_PORT, **credentials).close(), runs))
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark proxy throughput against a fake Tor SocksPort")
+    parser.add_argument("--payload-mb", type=float, default=32.0, help="Bytes echoed per connection, in MiB")
+    parser.add_argument("--concurrency", type=int, action="append", help="Parallel connections (repeatable)")
+    parser.add_argument("--connects", type=int, default=300)
+    args = parser.parse_args()
+    levels = args.concurrency or [1, 8]
+
+    with FakeTor() as tor:
+        results = {"direct": {}, "rotating_proxy": {}, "rotating_proxy_copy": {}}
+        credentials = {"username": "bench", "password": "0"}
+        results["direct"]["connect_ms"] = connect_latency(tor.socks_port, args.connects, **credentials)
+        results["direct"]["throughput"] = [
+            throughput(tor.socks_port, args.payload_mb, level, **credentials) for level in levels]
+
+        for name, use_splice in (("rotating_proxy", True), ("rotating_proxy_copy", False)):
+            server = RotatingSocksServer([("127.0.0.1", tor.socks_port)], port=0, policy=RotationPolicy("connection"))
+            server.use_splice = server.use_splice and use_splice
+            with ProxyThread(server):
+                results[name]["splice"] = server.use_splice
+                results[name]["connect_ms"] = connect_latency(server.port, args.connects)
+                results[name]["throughput"] = [throughput(server.port, args.payload_mb, level) for level in levels]
+                results[name]["stats"] = server.stats()
+
+    print(json.dumps({"benchmark": "proxy", **results}, indent=2))
+
+if __name__ == "__main__":
+    main()
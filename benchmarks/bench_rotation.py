@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import FakeTor, summarize, timed_calls
+from tornet import control
+from tornet.ipcheck import set_backends, fetch_ip
+from tornet.sessions import new_session
+from tornet.pool import TorInstance
+import tornet.tornet as cli
+
+ECHO_BACKEND = "http://192.0.2.1/"
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rotation and exit-IP lookup against a fake Tor")
+    parser.add_argument("--rotations", type=int, default=200)
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--build-delay", type=float, default=0.0, help="Simulated circuit build time in seconds")
+    args = parser.parse_args()
+
+    set_backends([ECHO_BACKEND], include_defaults=False)
+    with FakeTor(build_delay=args.build_delay) as tor, tempfile.TemporaryDirectory() as data_dir:
+        instance = TorInstance(0, tor.socks_port, tor.control_port, data_dir)
+        controller = instance.controller()
+        if controller is None:
+            sys.exit("Could not connect to the fake ControlPort")
+
+        rotations = timed_calls(lambda: cli.change_ip(instance=instance), args.rotations)
+        sources = cli._ip_source
+        newnym_only = timed_calls(lambda: control.new_identity(controller, 5), args.rotations)
+
+        circuit_id = tor.current
+        def uncached():
+            control._exit_cache.clear()
+            control.exit_ip(controller, circuit_id)
+        exit_uncached = timed_calls(uncached, args.lookups)
+        exit_cached = timed_calls(lambda: control.exit_ip(controller, circuit_id), args.lookups)
+        echo_warm = timed_calls(lambda: fetch_ip(tor.socks_port), args.lookups)
+        def echo_cold():
+            session = new_session(tor.socks_port, pool_size=1)
+            try:
+                fetch_ip(session=session)
+            finally:
+                session.close()
+        echo_cold_samples = timed_calls(echo_cold, max(args.lookups // 10, 1))
+
+        print(json.dumps({
+            "benchmark": "rotation",
+            "unit": "ms",
+            "build_delay": args.build_delay,
+            "newnym_signals": tor.newnyms,
+            "change_ip": {"source": sources, **summarize(rotations)},
+            "new_identity": summarize(newnym_only),
+            "exit_ip_controller": summarize(exit_uncached),
+            "exit_ip_controller_cached": summarize(exit_cached),
+            "exit_ip_echo_warm_session": summarize(echo_warm),
+            "exit_ip_echo_cold_session": summarize(echo_cold_samples),
+        }, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from harness import summarize
+from tornet.scheduler import RotationScheduler
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark scheduler lateness with many identities")
+    parser.add_argument("--identities", type=int, default=2000, help="Jobs, each rotating its own key")
+    parser.add_argument("--interval", type=str, default="0.5-1.5", help="Per-identity interval or range in seconds")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--work-ms", type=float, default=0.0, help="Simulated time spent in each rotation")
+    parser.add_argument("--shared-keys", type=int, default=0, help="Spread identities over N keys so fires coalesce")
+    args = parser.parse_args()
+
+    lateness = []
+    rotations = [0]
+
+    def rotate(key):
+        rotations[0] += 1
+        if args.work_ms:
+            time.sleep(args.work_ms / 1000)
+
+    def on_fire(job, result):
+        lateness.append(job.last_lateness)
+
+    scheduler = RotationScheduler(rotate, on_fire, rate_limit=0)
+    for i in range(args.identities):
+        key = i % args.shared_keys if args.shared_keys else i
+        scheduler.add(f"identity-{i}", args.interval, key=key)
+
+    timer = threading.Timer(args.duration, scheduler.stop)
+    timer.start()
+    start = time.perf_counter()
+    scheduler.run()
+    elapsed = time.perf_counter() - start
+    timer.cancel()
+
+    jobs = scheduler.report()
+    print(json.dumps({
+        "benchmark": "scheduler",
+        "unit": "ms",
+        "identities": args.identities,
+        "interval": args.interval,
+        "duration": round(elapsed, 3),
+        "fires": len(lateness),
+        "rotations": rotations[0],
+        "coalesced": sum(job["coalesced"] for job in jobs),
+        "fires_per_second": round(len(lateness) / elapsed, 1),
+        "lateness": summarize(lateness),
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
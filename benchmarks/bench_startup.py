@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from tornet.daemon import DaemonServer
+
+HEAVY_MODULES = ["requests", "urllib3", "yaml", "asyncio", "stem"]
+SUBCOMMANDS = {
+    "version": ["--version"],
+    "help": ["--help"],
+    "list-countries": ["--list-countries"],
+    "change": ["--change"],
+    "change-json": ["--change", "--json"],
+    "ip": ["--ip"],
+    "status": ["--status"],
+}
+LAUNCHER = "import sys; from tornet.tornet import main; sys.argv[0] = 'tornet'; main()"
+
+def fake_daemon(socket_file):
+    status = {
+        "tor_installed": True, "tor_running": True, "ip": "203.0.113.7", "country_code": "NL",
+        "country_name": "Netherlands", "configured_country": "NL", "service_manager": "systemctl",
+        "package_manager": "apt", "config_file": "config.yml", "log_file": "tornet.log",
+    }
+    server = DaemonServer({
+        "rotate": lambda country=None: {"ip": "203.0.113.7", "source": "tor", "backends": None},
+        "current_ip": lambda info=False: {"ip": "203.0.113.7"},
+        "status": lambda: {**status, "daemon": server.stats()},
+    }, socket_file)
+    server.bind()
+    return server
+
+def parse_importtime(stderr):
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        modules[name.strip()] = int(cumulative_us)
+    return modules
+
+def run_once(argv, env, importtime=False):
+    cmd = [sys.executable] + (["-X", "importtime"] if importtime else []) + ["-c", LAUNCHER] + argv
+    start = time.perf_counter()
+    result = subprocess.run(cmd, env=env, cwd=ROOT, capture_output=True, text=True, timeout=60)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} exited with {result.returncode}: {result.stderr.strip()[-500:]}")
+    return elapsed, result.stderr
+
+def measure(argv, env, runs):
+    run_once(argv, env)
+    times = [run_once(argv, env)[0] for _ in range(runs)]
+    _, stderr = run_once(argv, env, importtime=True)
+    modules = parse_importtime(stderr)
+    return {
+        "median_ms": round(statistics.median(times) * 1000, 1),
+        "min_ms": round(min(times) * 1000, 1),
+        "tornet_import_ms": round(modules.get("tornet.tornet", 0) / 1000, 1),
+        "heavy_modules": [name for name in HEAVY_MODULES if name in modules],
+    }
+
+def baseline(env, runs):
+    times = []
+    for _ in range(runs + 1):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times[1:]) * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tornet CLI startup per subcommand")
+    parser.add_argument("--runs", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=100.0, help="Allowed startup time above a bare interpreter")
+    parser.add_argument("--only", action="append", choices=sorted(SUBCOMMANDS), help="Only benchmark these subcommands")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, PYTHONPATH=ROOT)
+        server = fake_daemon(os.path.join(home, ".tornet", "tornet.sock"))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            python_ms = baseline(env, args.runs)
+            results = {name: measure(SUBCOMMANDS[name], env, args.runs) for name in args.only or SUBCOMMANDS}
+        finally:
+            server.shutdown()
+
+    failures = []
+    for name, result in results.items():
+        result["overhead_ms"] = round(result["min_ms"] - python_ms, 1)
+        if result["overhead_ms"] > args.budget_ms:
+            failures.append(f"{name}: {result['overhead_ms']}ms over a bare interpreter (budget {args.budget_ms}ms)")
+        if result["heavy_modules"]:
+            failures.append(f"{name}: imported {', '.join(result['heavy_modules'])}")
+
+    print(json.dumps({
+        "benchmark": "startup",
+        "python_ms": round(python_ms, 1),
+        "budget_ms": args.budget_ms,
+        "subcommands": results,
+        "failures": failures,
+    }, indent=2))
+    if failures:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+
+import time
+import base64
+import socket
+import struct
+import hashlib
+import threading
+import itertools
+import socketserver
+
+ECHO_PORT = 7
+DISCARD_PORT = 9
+TOR_VERSION = "0.4.8.10"
+
+class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+class Relay:
+    def __init__(self, index):
+        self.nickname = f"fake{index}"
+        self.fingerprint = hashlib.sha1(self.nickname.encode()).hexdigest().upper()
+        self.address = f"10.{(index >> 16) & 255}.{(index >> 8) & 255}.{index & 255}"
+
+    def status_entry(self):
+        identity = base64.b64encode(bytes.fromhex(self.fingerprint)).decode().rstrip("=")
+        return "\r\n".join([
+            f"r {self.nickname} {identity} {identity} 2024-01-01 00:00:00 {self.address} 9001 0",
+            "s Exit Fast Running Stable Valid",
+            "w Bandwidth=1000",
+        ])
+
+class FakeTor:
+    def __init__(self, build_delay=0.0, host="127.0.0.1"):
+        self.build_delay = build_delay
+        self.host = host
+        self.relays = {}
+        self.circuits = {}
+        self.current = None
+        self.newnyms = 0
+        self.socks_connections = 0
+        self.credentials = set()
+        self._relay_ids = itertools.count(1)
+        self._circuit_ids = itertools.count(1)
+        self._listeners = []
+        self._lock = threading.Lock()
+        self.control = Server((host, 0), ControlHandler, bind_and_activate=True)
+        self.control.tor = self
+        self.socks = Server((host, 0), SocksHandler, bind_and_activate=True)
+        self.socks.tor = self
+        self.build_circuit(notify=False)
+
+    @property
+    def control_port(self):
+        return self.control.server_address[1]
+
+    @property
+    def socks_port(self):
+        return self.socks.server_address[1]
+
+    @property
+    def exit_address(self):
+        with self._lock:
+            return self.relays[self.circuits[self.current][-1]].address
+
+    def start(self):
+        for server in (self.control, self.socks):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        for server in (self.control, self.socks):
+            server.shutdown()
+            server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def build_circuit(self, notify=True):
+        with self._lock:
+            path = []
+            for _ in range(3):
+                relay = Relay(next(self._relay_ids))
+                self.relays[relay.fingerprint] = relay
+                path.append(relay.fingerprint)
+            circuit_id = str(next(self._circuit_ids))
+            self.circuits = {circuit_id: path}
+            self.current = circuit_id
+        if notify:
+            self.emit("CIRC", f"650 CIRC {circuit_id} BUILT {self.path_string(path)} PURPOSE=GENERAL "
+                              f"TIME_CREATED={time.strftime('%Y-%m-%dT%H:%M:%S')}.000000")
+        return circuit_id
+
+    def newnym(self):
+        self.newnyms += 1
+        if self.build_delay:
+            threading.Timer(self.build_delay, self.build_circuit).start()
+        else:
+            self.build_circuit()
+
+    def path_string(self, path):
+        return ",".join(f"${fp}~{self.relays[fp].nickname}" for fp in path)
+
+    def circuit_status(self):
+        with self._lock:
+            return "\r\n".join(f"{cid} BUILT {self.path_string(path)} PURPOSE=GENERAL "
+                               f"TIME_CREATED=2024-01-01T00:00:00.000000"
+                               for cid, path in self.circuits.items())
+
+    def subscribe(self, handler):
+        with self._lock:
+            self._listeners.append(handler)
+
+    def unsubscribe(self, handler):
+        with self._lock:
+            if handler in self._listeners:
+                self._listeners.remove(handler)
+
+    def emit(self, event, line):
+        with self._lock:
+            listeners = [h for h in self._listeners if event in h.events]
+        for handler in listeners:
+            handler.send(line)
+
+class ControlHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.events = set()
+        self._write_lock = threading.Lock()
+        self.server.tor.subscribe(self)
+
+    def finish(self):
+        self.server.tor.unsubscribe(self)
+        super().finish()
+
+    def send(self, text):
+        try:
+            with self._write_lock:
+                self.wfile.write(text.encode() + b"\r\n")
+                self.wfile.flush()
+        except OSError:
+            pass
+
+    def handle(self):
+        tor = self.server.tor
+        for raw in self.rfile:
+            line = raw.decode(errors="replace").strip()
+            if not line:
+                continue
+            keyword, _, rest = line.partition(" ")
+            keyword = keyword.upper()
+            if keyword == "PROTOCOLINFO":
+                self.send(f'250-PROTOCOLINFO 1\r\n250-AUTH METHODS=NULL\r\n250-VERSION Tor="{TOR_VERSION}"\r\n250 OK')
+            elif keyword in ("AUTHENTICATE", "SETCONF", "RESETCONF", "TAKEOWNERSHIP"):
+                self.send("250 OK")
+            elif keyword == "SETEVENTS":
+                self.events = set(rest.upper().split()) - {"EXTENDED"}
+                self.send("250 OK")
+            elif keyword == "GETCONF":
+                keys = rest.split()
+                self.send("\r\n".join([f"250-{key}" for key in keys[:-1]] + [f"250 {keys[-1]}"]))
+            elif keyword == "GETINFO":
+                self.getinfo(rest.split())
+            elif keyword == "SIGNAL":
+                self.send("250 OK")
+                if rest.upper() == "NEWNYM":
+                    tor.newnym()
+            elif keyword == "QUIT":
+                self.send("250 closing connection")
+                return
+            else:
+                self.send(f'510 Unrecognized command "{keyword}"')
+
+    def getinfo(self, keys):
+        tor = self.server.tor
+        lines = []
+        for key in keys:
+            if key == "version":
+                lines.append(f"250-version={TOR_VERSION}")
+            elif key == "circuit-status":
+                lines.append(f"250+circuit-status=\r\n{tor.circuit_status()}\r\n.")
+            elif key == "status/bootstrap-phase":
+                lines.append('250-status/bootstrap-phase=NOTICE BOOTSTRAP PROGRESS=100 TAG=done SUMMARY="Done"')
+            elif key.startswith("ns/id/"):
+                relay = tor.relays.get(key[6:].lstrip("$").upper())
+                if relay is None:
+                    self.send(f'552 Unrecognized key "{key}"')
+                    return
+                lines.append(f"250+{key}=\r\n{relay.status_entry()}\r\n.")
+            else:
+                self.send(f'552 Unrecognized key "{key}"')
+                return
+        self.send("\r\n".join(lines + ["250 OK"]))
+
+class SocksHandler(socketserver.BaseRequestHandler):
+    def recv_exact(self, n):
+        data = b""
+        while len(data) < n:
+            chunk = self.request.recv(n - len(data))
+            if not chunk:
+                raise ConnectionError("client closed during handshake")
+            data += chunk
+        return data
+
+    def handle(self):
+        tor = self.server.tor
+        sock = self.request
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            version, nmethods = self.recv_exact(2)
+            methods = self.recv_exact(nmethods)
+            if 2 in methods:
+                sock.sendall(b"\x05\x02")
+                self.recv_exact(1)
+                username = self.recv_exact(self.recv_exact(1)[0])
+                password = self.recv_exact(self.recv_exact(1)[0])
+                tor.credentials.add((username, password))
+                sock.sendall(b"\x01\x00")
+            else:
+                sock.sendall(b"\x05\x00")
+            _, command, _, atyp = self.recv_exact(4)
+            if atyp == 1:
+                self.recv_exact(4)
+            elif atyp == 3:
+                self.recv_exact(self.recv_exact(1)[0])
+            else:
+                self.recv_exact(16)
+            port = struct.unpack("!H", self.recv_exact(2))[0]
+            sock.sendall(b"\x05\x00\x00\x01\x7f\x00\x00\x01" + struct.pack("!H", port))
+        except (ConnectionError, ValueError, OSError):
+            return
+        tor.socks_connections += 1
+        if port == ECHO_PORT:
+            self.echo()
+        elif port == DISCARD_PORT:
+            while sock.recv(65536):
+                pass
+        else:
+            self.http()
+
+    def echo(self):
+        while True:
+            data = self.request.recv(262144)
+            if not data:
+                return
+            self.request.sendall(data)
+
+    def http(self):
+        reader = self.request.makefile("rb")
+        while True:
+            request_line = reader.readline()
+            if not request_line:
+                return
+            while reader.readline() not in (b"\r\n", b"\n", b""):
+                pass
+            body = f"{self.server.tor.exit_address}\n".encode()
+            self.request.sendall(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\n"
+                                 b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+
+def socks_connect(port, target_port, host="127.0.0.1", username=None, password=None):
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if username:
+        sock.sendall(b"\x05\x01\x02")
+        assert sock.recv(2) == b"\x05\x02"
+        user, secret = username.encode(), password.encode()
+        sock.sendall(b"\x01" + bytes([len(user)]) + user + bytes([len(secret)]) + secret)
+        assert sock.recv(2) == b"\x01\x00"
+    else:
+        sock.sendall(b"\x05\x01\x00")
+        assert sock.recv(2) == b"\x05\x00"
+    sock.sendall(b"\x05\x01\x00\x01\x7f\x00\x00\x01" + struct.pack("!H", target_port))
+    reply = b""
+    while len(reply) < 10:
+        chunk = sock.recv(10 - len(reply))
+        if not chunk:
+            raise ConnectionError("proxy closed the connection")
+        reply += chunk
+    if reply[1] != 0:
+        raise ConnectionError(f"proxy refused CONNECT (reply {reply[1]})")
+    return sock
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+def summarize(samples, scale=1000.0, digits=3):
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples) * scale, digits),
+        "p50": round(percentile(samples, 0.5) * scale, digits),
+        "p95": round(percentile(samples, 0.95) * scale, digits),
+        "p99": round(percentile(samples, 0.99) * scale, digits),
+        "max": round(max(samples) * scale, digits),
+    }
+
+def timed_calls(func, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import subprocess
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+from tornet.tornet import VERSION
+
+BENCHMARKS = {
+    "rotation": ["bench_rotation.py"],
+    "proxy": ["bench_proxy.py"],
+    "scheduler": ["bench_scheduler.py"],
+    "startup": ["bench_startup.py"],
+    "geoip": ["bench_geoip.py"],
+}
+QUICK_ARGS = {
+    "rotation": ["--rotations", "50", "--lookups", "100"],
+    "proxy": ["--payload-mb", "4", "--connects", "50"],
+    "scheduler": ["--duration", "3", "--identities", "500"],
+    "startup": ["--runs", "3"],
+    "geoip": ["--v4-ranges", "20000", "--v6-ranges", "5000", "--lookups", "20000"],
+}
+
+def git_revision():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True)
+    except OSError:
+        return None
+    return result.stdout.strip() or None
+
+def run_benchmark(name, quick):
+    cmd = [sys.executable, os.path.join(HERE, *BENCHMARKS[name])] + (QUICK_ARGS[name] if quick else [])
+    start = time.perf_counter()
+    result = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    entry = {"seconds": round(time.perf_counter() - start, 2), "returncode": result.returncode}
+    try:
+        entry["result"] = json.loads(result.stdout)
+    except ValueError:
+        entry["error"] = (result.stderr or result.stdout).strip()[-2000:]
+    return entry
+
+def flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, item in value.items():
+            yield from flatten(item, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(value, list):
+        for i, item in enumerate(value):
+            yield from flatten(item, f"{prefix}[{i}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, value
+
+def compare(old, new):
+    before = dict(flatten(old.get("benchmarks", {})))
+    rows = []
+    for key, value in flatten(new.get("benchmarks", {})):
+        if key in before and before[key] and not key.endswith(("returncode", "count")):
+            rows.append({"metric": key, "before": before[key], "after": value,
+                         "change": round((value - before[key]) / abs(before[key]) * 100, 1)})
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the tornet benchmark suite and write JSON results")
+    parser.add_argument("--only", action="append", choices=sorted(BENCHMARKS), help="Run only these benchmarks")
+    parser.add_argument("--quick", action="store_true", help="Smaller workloads for a fast smoke run")
+    parser.add_argument("--output", type=str, help="Write results to this file (default: stdout)")
+    parser.add_argument("--compare", type=str, metavar="FILE", help="Print percentage changes against an earlier results file")
+    args = parser.parse_args()
+
+    results = {
+        "version": VERSION,
+        "revision": git_revision(),
+        "timestamp": time.time(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": args.quick,
+        "benchmarks": {},
+    }
+    for name in args.only or BENCHMARKS:
+        print(f"running {name}...", file=sys.stderr)
+        results["benchmarks"][name] = run_benchmark(name, args.quick)
+
+    if args.compare:
+        with open(args.compare, "r") as f:
+            results["comparison"] = {"against": args.compare, "metrics": compare(json.load(f), results)}
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+    if any(entry["returncode"] != 0 for entry in results["benchmarks"].values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
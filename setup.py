@@ -32,13 +32,12 @@ setup(
         "Topic :: Internet :: Proxy Servers",
         "Topic :: System :: Networking"
     ],
-    python_requires=">=3.6",
+    python_requires=">=3.7",
     install_requires=[
         "requests>=2.28.0",
         "stem>=1.8.0",
         "PySocks>=1.7.1",
-        "pyyaml>=6.0",
-        "schedule>=1.1.0"
+        "pyyaml>=6.0"
     ],
     entry_points={
         "console_scripts": [
@@ -1,11 +1,40 @@
-from .tornet import (
-    get_current_ip, 
-    change_ip, 
-    initialize_environment, 
-    change_ip_repeatedly,
-    show_status,
-    dns_leak_test,
-    toggle_kill_switch,
-    follow_logs,
-    auto_fix
-)
+import importlib
+
+_exports = {
+    "get_current_ip": "tornet",
+    "change_ip": "tornet",
+    "initialize_environment": "tornet",
+    "change_ip_repeatedly": "tornet",
+    "show_status": "tornet",
+    "dns_leak_test": "tornet",
+    "toggle_kill_switch": "tornet",
+    "follow_logs": "tornet",
+    "auto_fix": "tornet",
+    "TorPool": "pool",
+    "TorInstance": "pool",
+    "CountryPool": "pool",
+    "RotatingSocksServer": "socks_server",
+    "RotationPolicy": "socks_server",
+    "CircuitPool": "circuits",
+    "ExitHistory": "history",
+    "Identity": "history",
+    "distinct_identities": "history",
+    "IsolatedSession": "isolation",
+    "SessionFactory": "isolation",
+    "RotationScheduler": "scheduler",
+    "DaemonClient": "daemon",
+    "daemon_request": "daemon",
+}
+
+__all__ = list(_exports)
+
+def __getattr__(name):
+    module = _exports.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+from collections import deque
+
+POOL_SIZE = 3
+MAX_CIRCUIT_AGE = 600
+BUILD_TIMEOUT = 30
+HEALTH_CHECK_INTERVAL = 30
+
+class CircuitPool:
+    def __init__(self, controller, size=POOL_SIZE, max_age=MAX_CIRCUIT_AGE, build_timeout=BUILD_TIMEOUT, scores=None):
+        self.controller = controller
+        self.scores = scores
+        self.size = size
+        self.max_age = max_age
+        self.build_timeout = build_timeout
+        self.ready = deque()
+        self.current = None
+        self.exits = {}
+        self.streams = {}
+        self.built = 0
+        self.slow_closed = 0
+        self.build_failures = 0
+        self.rotations = 0
+        self.last_rotate_to_first_byte = None
+        self.total_rotate_to_first_byte = 0.0
+        self.measured_rotations = 0
+        self._rotated_at = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        from stem.control import EventType
+
+        self.controller.set_conf("__LeaveStreamsUnattached", "1")
+        self.controller.add_event_listener(self._on_stream, EventType.STREAM)
+        self.controller.add_event_listener(self._on_circuit, EventType.CIRC)
+        self._thread = threading.Thread(target=self._refill_loop, name="tornet-circuits", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(self.build_timeout)
+        try:
+            self.controller.remove_event_listener(self._on_stream)
+            self.controller.remove_event_listener(self._on_circuit)
+            self.controller.reset_conf("__LeaveStreamsUnattached")
+        except Exception:
+            pass
+        self.flush()
+
+    def wait_until_ready(self, timeout=BUILD_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._lock:
+                if self.ready:
+                    return True
+            time.sleep(0.05)
+        return False
+
+    def flush(self):
+        with self._lock:
+            circuits = [cid for cid, _ in self.ready]
+            self.ready.clear()
+        for cid in circuits:
+            self._close(cid)
+        self._wakeup.set()
+
+    def rotate(self):
+        if self.scores is not None:
+            with self._lock:
+                self.ready = deque(sorted(self.ready, key=lambda entry: self.scores.cost(self.exits.get(entry[0]))))
+        while True:
+            with self._lock:
+                if not self.ready:
+                    previous, self.current = self.current, None
+                    break
+                cid, built_at = self.ready.popleft()
+            if self._is_healthy(cid, built_at):
+                with self._lock:
+                    previous, self.current = self.current, cid
+                break
+            self._close(cid)
+        with self._lock:
+            self._rotated_at = time.monotonic()
+            self.rotations += 1
+        self._wakeup.set()
+        if previous is not None:
+            self._close(previous)
+        return self.current
+
+    def metrics(self):
+        with self._lock:
+            average = (self.total_rotate_to_first_byte / self.measured_rotations
+                       if self.measured_rotations else None)
+            return {
+                "ready_circuits": len(self.ready),
+                "current_circuit": self.current,
+                "circuits_built": self.built,
+                "build_failures": self.build_failures,
+                "slow_exits_closed": self.slow_closed,
+                "rotations": self.rotations,
+                "last_rotate_to_first_byte": self.last_rotate_to_first_byte,
+                "avg_rotate_to_first_byte": average,
+            }
+
+    def _refill_loop(self):
+        while not self._stopped.is_set():
+            self._prune()
+            with self._lock:
+                missing = self.size - len(self.ready)
+            if missing > 0:
+                self._build()
+                continue
+            self._wakeup.wait(HEALTH_CHECK_INTERVAL)
+            self._wakeup.clear()
+
+    def _build(self):
+        try:
+            cid = self.controller.new_circuit(await_build=True, timeout=self.build_timeout)
+        except Exception:
+            with self._lock:
+                self.build_failures += 1
+            self._stopped.wait(1)
+            return
+        fingerprint = None
+        if self.scores is not None:
+            circuit = self.controller.get_circuit(cid, None)
+            if circuit is not None and circuit.path:
+                fingerprint = circuit.path[-1][0]
+            if self.scores.is_slow(fingerprint):
+                self._close(cid)
+                with self._lock:
+                    self.slow_closed += 1
+                return
+        with self._lock:
+            self.ready.append((cid, time.monotonic()))
+            self.exits[cid] = fingerprint
+            self.built += 1
+
+    def _prune(self):
+        with self._lock:
+            candidates = list(self.ready)
+            current = self.current
+        if current is not None and self._slow_exit(current):
+            with self._lock:
+                self.slow_closed += 1
+            self.rotate()
+        stale = [cid for cid, built_at in candidates if not self._is_healthy(cid, built_at)]
+        if not stale:
+            return
+        with self._lock:
+            self.slow_closed += sum(1 for cid in stale if self._slow_exit(cid))
+            self.ready = deque(entry for entry in self.ready if entry[0] not in stale)
+        for cid in stale:
+            self._close(cid)
+
+    def _slow_exit(self, cid):
+        return self.scores is not None and self.scores.is_slow(self.exits.get(cid))
+
+    def _is_healthy(self, cid, built_at):
+        from stem import CircStatus
+
+        if time.monotonic() - built_at > self.max_age or self._slow_exit(cid):
+            return False
+        circuit = self.controller.get_circuit(cid, None)
+        return circuit is not None and circuit.status == CircStatus.BUILT
+
+    def _close(self, cid):
+        try:
+            self.controller.close_circuit(cid)
+        except Exception:
+            pass
+
+    def _on_circuit(self, event):
+        from stem import CircStatus
+
+        if event.status in (CircStatus.FAILED, CircStatus.CLOSED):
+            with self._lock:
+                self.ready = deque(entry for entry in self.ready if entry[0] != event.id)
+                if self.current == event.id:
+                    self.current = None
+                self.exits.pop(event.id, None)
+            self._wakeup.set()
+
+    def _on_stream(self, event):
+        from stem import StreamStatus
+
+        if event.status in (StreamStatus.NEW, StreamStatus.NEWRESOLVE) and event.circ_id is None:
+            with self._lock:
+                cid = self.current
+                if self.scores is not None:
+                    self.streams[event.id] = time.monotonic()
+            try:
+                self.controller.attach_stream(event.id, cid or "0")
+            except Exception:
+                if cid:
+                    try:
+                        self.controller.attach_stream(event.id, "0")
+                    except Exception:
+                        pass
+        elif event.status == StreamStatus.FAILED:
+            self._score_stream(event, failed=True)
+        elif event.status == StreamStatus.CLOSED:
+            with self._lock:
+                self.streams.pop(event.id, None)
+        elif event.status == StreamStatus.SUCCEEDED:
+            self._score_stream(event)
+            with self._lock:
+                if self._rotated_at is not None and self.current in (None, event.circ_id):
+                    elapsed = time.monotonic() - self._rotated_at
+                    self._rotated_at = None
+                    self.last_rotate_to_first_byte = elapsed
+                    self.total_rotate_to_first_byte += elapsed
+                    self.measured_rotations += 1
+
+    def _score_stream(self, event, failed=False):
+        if self.scores is None:
+            return
+        with self._lock:
+            opened = self.streams.pop(event.id, None)
+            fingerprint = self.exits.get(event.circ_id)
+        if opened is None or fingerprint is None:
+            return
+        if failed:
+            self.scores.record(fingerprint, failed=True)
+        else:
+            self.scores.record(fingerprint, ttfb=time.monotonic() - opened)
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import threading
+
+from .control import DNS_PORT
+from .pool import BASE_SOCKS_PORT, BASE_CONTROL_PORT
+from .scheduler import interval_bounds
+
+RELOAD_INTERVAL = 2.0
+
+class ConfigError(ValueError):
+    pass
+
+def parse_interval(value):
+    value = str(value).strip()
+    interval_bounds(value)
+    return value
+
+def parse_int(value, minimum, maximum=None):
+    number = value
+    if isinstance(number, str) and number.strip().isdigit():
+        number = int(number)
+    if isinstance(number, float) and number.is_integer():
+        number = int(number)
+    if isinstance(number, bool) or not isinstance(number, int) or number < minimum or (maximum and number > maximum):
+        bounds = f"between {minimum} and {maximum}" if maximum else f">= {minimum}"
+        raise ValueError(f"expected a whole number {bounds}, got {value!r}")
+    return number
+
+def parse_count(value):
+    return parse_int(value, 0)
+
+def parse_positive(value):
+    return parse_int(value, 1)
+
+def parse_port(value):
+    return parse_int(value, 1, 65535)
+
+def parse_country_code(value):
+    code = str(value).strip().upper()
+    if len(code) != 2 or not code.isalpha():
+        raise ValueError(f"expected a two-letter country code, got {value!r}")
+    return code
+
+def parse_country(value):
+    if value is None or str(value).strip().lower() in ("", "auto"):
+        return None
+    return parse_country_code(value)
+
+def parse_countries(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f"expected a list of country codes, got {value!r}")
+    codes = [parse_country_code(code) for code in value if str(code).strip()]
+    return list(dict.fromkeys(codes)) or None
+
+def parse_urls(value):
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, (list, tuple)):
+        raise ValueError(f"expected a list of URLs, got {value!r}")
+    for url in value:
+        if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+            raise ValueError(f"expected an http:// or https:// URL, got {url!r}")
+    return list(value) or None
+
+class Field:
+    def __init__(self, name, path, parse, default, live=True):
+        self.name = name
+        self.path = path
+        self.parse = parse
+        self.default = default
+        self.live = live
+
+    @property
+    def key(self):
+        return ".".join(self.path)
+
+FIELDS = [
+    Field("interval", ("default", "interval"), parse_interval, "60"),
+    Field("count", ("default", "count"), parse_count, 10),
+    Field("country", ("default", "country"), parse_country, None),
+    Field("countries", ("default", "countries"), parse_countries, None),
+    Field("instances", ("default", "instances"), parse_positive, 1),
+    Field("pool_socks_port", ("network", "pool_socks_port"), parse_port, BASE_SOCKS_PORT, live=False),
+    Field("pool_control_port", ("network", "pool_control_port"), parse_port, BASE_CONTROL_PORT, live=False),
+    Field("dns_port", ("network", "dns_port"), parse_port, DNS_PORT),
+    Field("backends", ("ip_check", "backends"), parse_urls, None),
+]
+FIELDS_BY_NAME = {field.name: field for field in FIELDS}
+SECTIONS = {field.path[0] for field in FIELDS}
+
+class Settings:
+    def __init__(self, values, warnings=()):
+        self.values = values
+        self.warnings = list(warnings)
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["values"][name]
+        except KeyError:
+            raise AttributeError(name)
+
+    def diff(self, other):
+        return [field.name for field in FIELDS if self.values[field.name] != other.values[field.name]]
+
+    def to_dict(self):
+        return dict(self.values)
+
+def parse_settings(data, overrides=None):
+    if not isinstance(data, dict):
+        raise ConfigError("the config file must contain a mapping")
+    values = {}
+    errors = []
+    warnings = []
+    for section in SECTIONS:
+        if not isinstance(data.get(section) or {}, dict):
+            errors.append(f"{section}: expected a mapping")
+    for field in FIELDS:
+        section = data.get(field.path[0]) or {}
+        raw = section.get(field.path[1]) if isinstance(section, dict) else None
+        try:
+            values[field.name] = field.default if raw is None else field.parse(raw)
+        except (TypeError, ValueError) as e:
+            errors.append(f"{field.key}: {e}")
+    for section in SECTIONS:
+        entries = data.get(section)
+        if not isinstance(entries, dict):
+            continue
+        known = {field.path[1] for field in FIELDS if field.path[0] == section}
+        for key in entries:
+            if key not in known:
+                warnings.append(f"{section}.{key} is not a known setting and is ignored")
+    for name, value in (overrides or {}).items():
+        if value is None:
+            continue
+        try:
+            values[name] = FIELDS_BY_NAME[name].parse(value)
+        except (TypeError, ValueError) as e:
+            errors.append(f"--{name.replace('_', '-')}: {e}")
+    if errors:
+        raise ConfigError("; ".join(errors))
+    return Settings(values, warnings)
+
+def read_config(config_file):
+    if not os.path.exists(config_file):
+        return {}
+    with open(config_file, "r") as f:
+        if config_file.endswith(".yml") or config_file.endswith(".yaml"):
+            import yaml
+            try:
+                return yaml.safe_load(f) or {}
+            except yaml.YAMLError as e:
+                raise ConfigError(f"invalid YAML: {e}")
+        if config_file.endswith(".json"):
+            try:
+                return json.load(f)
+            except ValueError as e:
+                raise ConfigError(f"invalid JSON: {e}")
+    raise ConfigError(f"Unsupported config format: {config_file}")
+
+def file_stamp(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size, st.st_ino
+
+class ConfigWatcher:
+    def __init__(self, config_file, settings, overrides=None, interval=RELOAD_INTERVAL, on_error=None):
+        self.config_file = config_file
+        self.settings = settings
+        self.overrides = dict(overrides or {})
+        self.interval = interval
+        self.on_error = on_error
+        self._listeners = []
+        self._stamp = file_stamp(config_file)
+        self._wake = threading.Event()
+        self._forced = False
+        self._stopped = False
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def request_reload(self):
+        self._forced = True
+        self._wake.set()
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._loop, name="tornet-config", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def _loop(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stopped:
+                return
+            stamp = file_stamp(self.config_file)
+            if self._forced or stamp != self._stamp:
+                self._forced = False
+                self._stamp = stamp
+                self.reload()
+
+    def reload(self):
+        with self._lock:
+            try:
+                settings = parse_settings(read_config(self.config_file), self.overrides)
+            except (OSError, ConfigError) as e:
+                if self.on_error is not None:
+                    self.on_error(e)
+                return None
+            old, self.settings = self.settings, settings
+            changed = settings.diff(old)
+            if changed:
+                for listener in list(self._listeners):
+                    listener(old, settings, changed)
+            return changed
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+
+import os
+import re
+import time
+import socket
+import threading
+
+from .metrics import BOOTSTRAP_SECONDS, BOOTSTRAP_FAILURES
+
+SOCKS_HOST = "127.0.0.1"
+SOCKS_PORT = 9050
+CONTROL_HOST = "127.0.0.1"
+CONTROL_PORT = 9051
+DNS_PORT = 9053
+CIRCUIT_TIMEOUT = 30
+BOOTSTRAP_TIMEOUT = 120
+
+BOOTSTRAP_PHASE_RE = re.compile(r"PROGRESS=(\d+)")
+BOOTSTRAP_LOG_RE = re.compile(r"Bootstrapped (\d+)%")
+
+EXIT_CACHE_SIZE = 256
+SYSTEM_NOTICE_LOGS = ("/var/log/tor/notices.log", "/var/log/tor/notice.log", "/var/log/tor/log")
+
+_controllers = {}
+_controllers_lock = threading.Lock()
+_exit_cache = {}
+_exit_cache_lock = threading.Lock()
+
+def tor_proxies(port=SOCKS_PORT, host=SOCKS_HOST, username=None, password=None):
+    credentials = f"{username}:{password}@" if username else ""
+    proxy = f"socks5h://{credentials}{host}:{port}"
+    return {"http": proxy, "https": proxy}
+
+def connect_controller(port=CONTROL_PORT, host=CONTROL_HOST, password=None):
+    try:
+        from stem.control import Controller
+    except ImportError:
+        return None
+
+    try:
+        controller = Controller.from_port(address=host, port=port)
+    except Exception:
+        return None
+
+    try:
+        controller.authenticate(password=password)
+    except Exception:
+        controller.close()
+        return None
+    return controller
+
+def get_controller(port=CONTROL_PORT, host=CONTROL_HOST, password=None):
+    key = (host, port)
+    with _controllers_lock:
+        controller = _controllers.get(key)
+        if controller is not None and controller.is_alive():
+            return controller
+        controller = connect_controller(port, host, password)
+        if controller is None:
+            _controllers.pop(key, None)
+        else:
+            _controllers[key] = controller
+        return controller
+
+def close_controllers():
+    with _controllers_lock:
+        for controller in _controllers.values():
+            try:
+                controller.close()
+            except Exception:
+                pass
+        _controllers.clear()
+
+def set_exit_country(controller, country_code=None):
+    if country_code and country_code.lower() != "auto":
+        controller.set_options({"ExitNodes": f"{{{country_code.upper()}}}", "StrictNodes": "1"})
+    else:
+        controller.reset_conf("ExitNodes", "StrictNodes")
+
+def ensure_dns_port(controller, port=DNS_PORT, host=SOCKS_HOST):
+    current = controller.get_conf("DNSPort", None)
+    if current and current != "0":
+        return current
+    controller.set_conf("DNSPort", f"{host}:{port}")
+    return f"{host}:{port}"
+
+def is_general_circuit(event):
+    return event.purpose == "GENERAL" and "IS_INTERNAL" not in (event.build_flags or ())
+
+def new_identity(controller, timeout=CIRCUIT_TIMEOUT):
+    from stem import CircStatus, Signal
+    from stem.control import EventType
+
+    built = threading.Event()
+    circuits = []
+
+    def on_circuit(event):
+        if event.status == CircStatus.BUILT and is_general_circuit(event) and not built.is_set():
+            circuits.append(event.id)
+            built.set()
+
+    controller.add_event_listener(on_circuit, EventType.CIRC)
+    try:
+        controller.signal(Signal.NEWNYM)
+        if built.wait(timeout):
+            return circuits[0]
+        return None
+    finally:
+        controller.remove_event_listener(on_circuit)
+
+def latest_circuit(controller):
+    from stem import CircStatus
+
+    built = [
+        circuit for circuit in controller.get_circuits([])
+        if circuit.status == CircStatus.BUILT and circuit.path and is_general_circuit(circuit)
+    ]
+    if not built:
+        return None
+    return max(built, key=lambda circuit: (circuit.created is not None, circuit.created, int(circuit.id)))
+
+def exit_ip(controller, circuit_id=None):
+    try:
+        if circuit_id is None:
+            circuit = latest_circuit(controller)
+        else:
+            circuit = controller.get_circuit(circuit_id, None)
+    except Exception:
+        return None
+    if circuit is None or not circuit.path:
+        return None
+
+    control_socket = controller.get_socket()
+    key = (getattr(control_socket, "get_port", lambda: None)(), circuit.id)
+    with _exit_cache_lock:
+        if key in _exit_cache:
+            return _exit_cache[key]
+
+    fingerprint = circuit.path[-1][0]
+    try:
+        address = controller.get_network_status(fingerprint).address
+    except Exception:
+        return None
+
+    with _exit_cache_lock:
+        if len(_exit_cache) >= EXIT_CACHE_SIZE:
+            _exit_cache.clear()
+        _exit_cache[key] = address
+    return address
+
+def exit_fingerprint(controller, circuit_id=None):
+    try:
+        if circuit_id is None:
+            circuit = latest_circuit(controller)
+        else:
+            circuit = controller.get_circuit(circuit_id, None)
+    except Exception:
+        return None
+    if circuit is None or not circuit.path:
+        return None
+    return circuit.path[-1][0]
+
+def is_port_open(port, host=SOCKS_HOST, timeout=0.5):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+def wait_for_port_closed(port, host=SOCKS_HOST, timeout=10):
+    deadline = time.monotonic() + timeout
+    while is_port_open(port, host):
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+def bootstrap_progress(controller):
+    try:
+        match = BOOTSTRAP_PHASE_RE.search(controller.get_info("status/bootstrap-phase"))
+    except Exception:
+        return None
+    return int(match.group(1)) if match else None
+
+def wait_for_controller_bootstrap(controller, deadline):
+    from stem.control import EventType
+
+    done = threading.Event()
+
+    def on_status(event):
+        if event.action == "BOOTSTRAP" and event.arguments.get("PROGRESS") == "100":
+            done.set()
+
+    controller.add_event_listener(on_status, EventType.STATUS_CLIENT)
+    try:
+        if bootstrap_progress(controller) == 100:
+            return 100
+        if done.wait(max(deadline - time.monotonic(), 0)):
+            return 100
+        return bootstrap_progress(controller) or 0
+    finally:
+        controller.remove_event_listener(on_status)
+
+def scan_notice_log(log_file, offset, progress):
+    try:
+        with open(log_file, "r", errors="replace") as f:
+            f.seek(offset)
+            for line in f:
+                match = BOOTSTRAP_LOG_RE.search(line)
+                if match:
+                    progress = int(match.group(1))
+            return f.tell(), progress
+    except OSError:
+        return offset, progress
+
+def system_notice_log():
+    for path in SYSTEM_NOTICE_LOGS:
+        if os.access(path, os.R_OK):
+            return path
+    return None
+
+def wait_for_bootstrap(control_port=CONTROL_PORT, socks_port=SOCKS_PORT, timeout=BOOTSTRAP_TIMEOUT,
+                       log_file=None, password=None):
+    start = time.monotonic()
+    try:
+        source = poll_bootstrap(control_port, socks_port, start + timeout, log_file, password)
+    except TimeoutError as e:
+        BOOTSTRAP_FAILURES.inc()
+        raise TimeoutError(f"Tor did not finish bootstrapping within {timeout}s (reached {e.args[0]}%)") from None
+    BOOTSTRAP_SECONDS.observe(time.monotonic() - start)
+    return source
+
+def poll_bootstrap(control_port, socks_port, deadline, log_file=None, password=None):
+    progress = 0
+    offset = 0
+    system_log = None if log_file else system_notice_log()
+    while True:
+        controller = get_controller(control_port, password=password)
+        if controller is not None:
+            progress = wait_for_controller_bootstrap(controller, deadline)
+            if progress == 100:
+                return "controller"
+            break
+        if log_file:
+            offset, progress = scan_notice_log(log_file, offset, progress)
+            if progress == 100:
+                return "log"
+        elif system_log:
+            offset, progress = scan_notice_log(system_log, offset, progress)
+            if progress == 100 and is_port_open(socks_port):
+                return "log"
+        elif is_port_open(socks_port):
+            return "port"
+        if time.monotonic() >= deadline:
+            break
+        time.sleep(0.1)
+    raise TimeoutError(progress)
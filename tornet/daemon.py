@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import socket
+import threading
+import socketserver
+
+SOCKET_FILE = os.path.expanduser("~/.tornet/tornet.sock")
+REQUEST_TIMEOUT = 120
+
+class DaemonError(Exception):
+    pass
+
+class CommandStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.last_seconds = None
+
+    def record(self, elapsed, failed):
+        self.calls += 1
+        self.total_seconds += elapsed
+        self.last_seconds = elapsed
+        if failed:
+            self.errors += 1
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "last_seconds": round(self.last_seconds, 4) if self.last_seconds is not None else None,
+            "avg_seconds": round(self.total_seconds / self.calls, 4) if self.calls else None,
+        }
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            response = self.server.daemon.dispatch(line)
+            self.wfile.write(json.dumps(response).encode() + b"\n")
+            self.wfile.flush()
+
+class UnixServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+class DaemonServer:
+    def __init__(self, handlers, socket_file=SOCKET_FILE):
+        self.handlers = dict(handlers)
+        self.handlers.setdefault("ping", lambda: {"pid": os.getpid()})
+        self.socket_file = socket_file
+        self.started = None
+        self.commands = {}
+        self._server = None
+        self._lock = threading.Lock()
+
+    def stats(self):
+        with self._lock:
+            commands = {name: stats.as_dict() for name, stats in self.commands.items()}
+        return {
+            "pid": os.getpid(),
+            "uptime": round(time.monotonic() - self.started, 3) if self.started else 0.0,
+            "commands": commands,
+        }
+
+    def dispatch(self, line):
+        try:
+            message = json.loads(line)
+            command = message["command"]
+            params = message.get("params") or {}
+        except (ValueError, KeyError, TypeError):
+            return {"ok": False, "error": "Malformed request"}
+        handler = self.handlers.get(command)
+        if handler is None:
+            return {"ok": False, "error": f"Unknown command: {command}"}
+
+        start = time.monotonic()
+        try:
+            result = handler(**params)
+        except Exception as e:
+            response = {"ok": False, "error": str(e) or type(e).__name__}
+        else:
+            response = {"ok": True, "result": result}
+        with self._lock:
+            self.commands.setdefault(command, CommandStats()).record(time.monotonic() - start, not response["ok"])
+        return response
+
+    def bind(self):
+        os.makedirs(os.path.dirname(self.socket_file), exist_ok=True)
+        if os.path.exists(self.socket_file):
+            if daemon_running(self.socket_file):
+                raise OSError(f"A tornet daemon is already listening on {self.socket_file}")
+            os.remove(self.socket_file)
+        old_umask = os.umask(0o177)
+        try:
+            self._server = UnixServer(self.socket_file, RequestHandler)
+        finally:
+            os.umask(old_umask)
+        self._server.daemon = self
+        self.started = time.monotonic()
+
+    def serve_forever(self):
+        if self._server is None:
+            self.bind()
+        try:
+            self._server.serve_forever()
+        finally:
+            self.close()
+
+    def shutdown(self):
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def close(self):
+        server, self._server = self._server, None
+        if server is None:
+            return
+        server.server_close()
+        try:
+            os.remove(self.socket_file)
+        except OSError:
+            pass
+
+class DaemonClient:
+    def __init__(self, socket_file=SOCKET_FILE, timeout=REQUEST_TIMEOUT):
+        self.socket_file = socket_file
+        self.timeout = timeout
+        self._sock = None
+        self._reader = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(self.socket_file)
+        except OSError:
+            sock.close()
+            raise
+        self._sock = sock
+        self._reader = sock.makefile("rb")
+
+    def close(self):
+        if self._sock is not None:
+            self._reader.close()
+            self._sock.close()
+            self._sock = self._reader = None
+
+    def call(self, command, **params):
+        with self._lock:
+            if self._sock is None:
+                self.connect()
+            try:
+                self._sock.sendall(json.dumps({"command": command, "params": params}).encode() + b"\n")
+                line = self._reader.readline()
+            except OSError:
+                self.close()
+                raise
+            if not line:
+                self.close()
+                raise ConnectionError("tornet daemon closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise DaemonError(response.get("error", "Unknown error"))
+        return response.get("result")
+
+def daemon_request(command, socket_file=SOCKET_FILE, timeout=REQUEST_TIMEOUT, **params):
+    with DaemonClient(socket_file, timeout) as client:
+        return client.call(command, **params)
+
+def daemon_running(socket_file=SOCKET_FILE):
+    if not os.path.exists(socket_file):
+        return False
+    try:
+        daemon_request("ping", socket_file, timeout=2)
+    except (OSError, ValueError, DaemonError):
+        return False
+    return True
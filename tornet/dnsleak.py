@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import socket
+import struct
+import threading
+
+from .control import SOCKS_HOST, DNS_PORT
+
+DEFAULT_NAMES = ["torproject.org", "check.torproject.org", "example.com"]
+DEFAULT_URLS = ["https://dnsleaktest.com", "https://ipleak.net", "https://www.dnsleaktest.com"]
+LEAK_TEST_TIMEOUT = 10
+RESOLV_CONF = "/etc/resolv.conf"
+
+DNS_HEADER = struct.Struct("!HHHHHH")
+DNS_ANSWER = struct.Struct("!HHIH")
+TYPE_A = 1
+TYPE_AAAA = 28
+CLASS_IN = 1
+RCODES = {1: "FORMERR", 2: "SERVFAIL", 3: "NXDOMAIN", 4: "NOTIMP", 5: "REFUSED"}
+
+class DNSError(Exception):
+    pass
+
+def parse_server(server, default_port=DNS_PORT):
+    if isinstance(server, (tuple, list)):
+        return server[0], int(server[1])
+    server = str(server).strip()
+    if server.startswith("["):
+        host, _, rest = server[1:].partition("]")
+        if rest and not rest.startswith(":"):
+            raise ValueError(f"Invalid DNS server address: {server!r}")
+        return host, int(rest[1:]) if rest else default_port
+    if server.count(":") > 1:
+        return server, default_port
+    host, _, port = server.partition(":")
+    return host, int(port) if port else default_port
+
+def build_query(name, qtype=TYPE_A, query_id=None):
+    if query_id is None:
+        query_id = struct.unpack("!H", os.urandom(2))[0]
+    question = b"".join(bytes([len(label)]) + label for label in name.rstrip(".").encode("idna").split(b"."))
+    packet = DNS_HEADER.pack(query_id, 0x0100, 1, 0, 0, 0) + question + b"\0" + struct.pack("!HH", qtype, CLASS_IN)
+    return query_id, packet
+
+def skip_name(data, offset):
+    while True:
+        if offset >= len(data):
+            raise DNSError("Truncated name in DNS response")
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            return offset + 2
+        if length == 0:
+            return offset + 1
+        offset += length + 1
+
+def parse_response(data, query_id):
+    if len(data) < DNS_HEADER.size:
+        raise DNSError("Short DNS response")
+    response_id, flags, questions, answers, _, _ = DNS_HEADER.unpack_from(data)
+    if response_id != query_id:
+        raise DNSError("DNS response ID mismatch")
+    rcode = flags & 0x000F
+    if rcode:
+        raise DNSError(RCODES.get(rcode, f"rcode {rcode}"))
+    offset = DNS_HEADER.size
+    for _ in range(questions):
+        offset = skip_name(data, offset) + 4
+    addresses = []
+    for _ in range(answers):
+        offset = skip_name(data, offset)
+        rtype, rclass, _, length = DNS_ANSWER.unpack_from(data, offset)
+        offset += DNS_ANSWER.size
+        rdata = data[offset:offset + length]
+        offset += length
+        if rclass != CLASS_IN:
+            continue
+        if rtype == TYPE_A and length == 4:
+            addresses.append(socket.inet_ntop(socket.AF_INET, rdata))
+        elif rtype == TYPE_AAAA and length == 16:
+            addresses.append(socket.inet_ntop(socket.AF_INET6, rdata))
+    return sorted(set(addresses))
+
+def resolve_via(name, server, timeout=LEAK_TEST_TIMEOUT):
+    host, port = parse_server(server)
+    query_id, packet = build_query(name)
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    deadline = time.monotonic() + timeout
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.connect((host, port))
+        sock.send(packet)
+        while True:
+            sock.settimeout(max(deadline - time.monotonic(), 0.01))
+            try:
+                data = sock.recv(4096)
+            except socket.timeout:
+                raise DNSError(f"No answer from {host}:{port}")
+            except ConnectionRefusedError:
+                raise DNSError(f"Nothing listening on {host}:{port}")
+            try:
+                return parse_response(data, query_id)
+            except DNSError as e:
+                if str(e) != "DNS response ID mismatch":
+                    raise
+
+def resolve_system(name):
+    try:
+        results = socket.getaddrinfo(name, None, socket.AF_INET, socket.SOCK_STREAM)
+    except socket.gaierror as e:
+        raise DNSError(e.strerror or str(e))
+    return sorted(set(result[4][0] for result in results))
+
+def system_nameservers(path=RESOLV_CONF):
+    servers = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == "nameserver":
+                    servers.append(fields[1])
+    except OSError:
+        pass
+    return servers
+
+def probe_url(url, session, timeout):
+    response = session.get(url, timeout=timeout)
+    return response.status_code
+
+class Probe(threading.Thread):
+    def __init__(self, func, *args):
+        super().__init__(daemon=True)
+        self.func = func
+        self.args = args
+        self.result = None
+        self.error = "timed out"
+        self.seconds = None
+
+    def run(self):
+        start = time.monotonic()
+        try:
+            self.result = self.func(*self.args)
+            self.error = None
+        except Exception as e:
+            self.error = str(e) or type(e).__name__
+        self.seconds = round(time.monotonic() - start, 4)
+
+def run_probes(probes, timeout):
+    deadline = time.monotonic() + timeout
+    for probe in probes:
+        probe.start()
+    for probe in probes:
+        probe.join(max(deadline - time.monotonic(), 0))
+
+def leak_test(names=None, urls=None, dns_server=None, session=None, timeout=LEAK_TEST_TIMEOUT):
+    names = list(DEFAULT_NAMES if names is None else names)
+    urls = list(DEFAULT_URLS if urls is None else urls) if session is not None else []
+    dns_server = dns_server or (SOCKS_HOST, DNS_PORT)
+    started = time.monotonic()
+
+    tor_probes = [Probe(resolve_via, name, dns_server, timeout) for name in names]
+    system_probes = [Probe(resolve_system, name) for name in names]
+    url_probes = [Probe(probe_url, url, session, timeout) for url in urls]
+    run_probes(tor_probes + system_probes + url_probes, timeout)
+
+    name_results = []
+    for name, tor, system in zip(names, tor_probes, system_probes):
+        match = None
+        if tor.error is None and system.error is None:
+            match = bool(set(tor.result) & set(system.result))
+        name_results.append({
+            "name": name,
+            "tor": tor.result, "tor_error": tor.error, "tor_seconds": tor.seconds,
+            "system": system.result, "system_error": system.error, "system_seconds": system.seconds,
+            "match": match,
+        })
+    url_results = [
+        {"url": url, "status": probe.result, "ok": probe.result == 200, "error": probe.error, "seconds": probe.seconds}
+        for url, probe in zip(urls, url_probes)
+    ]
+
+    host, port = parse_server(dns_server)
+    nameservers = system_nameservers()
+    system_reachable = any(probe.error is None for probe in system_probes)
+    outside_tor = [server for server in nameservers if not (port == 53 and server == host)]
+    mismatches = [result["name"] for result in name_results if result["match"] is False]
+    return {
+        "dns_server": f"{host}:{port}",
+        "system_nameservers": nameservers,
+        "names": name_results,
+        "urls": url_results,
+        "dns_port_ok": bool(names) and all(probe.error is None for probe in tor_probes),
+        "system_resolver_reachable": system_reachable,
+        "non_tor_nameservers": outside_tor,
+        "mismatches": mismatches,
+        "leak": system_reachable and bool(outside_tor or mismatches),
+        "seconds": round(time.monotonic() - started, 4),
+    }
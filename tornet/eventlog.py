@@ -0,0 +1,361 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import mmap
+import time
+import atexit
+import select
+import shutil
+import struct
+import fcntl
+import bisect
+import threading
+
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 5
+FLUSH_INTERVAL = 1.0
+FLUSH_EVENTS = 256
+INDEX_RECORD = struct.Struct("<dQ")
+
+IN_MODIFY = 0x00000002
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+INOTIFY_EVENT = struct.Struct("iIII")
+
+def index_path(log_file):
+    return f"{log_file}.idx"
+
+def segment_path(log_file, n):
+    return f"{log_file}.{n}.gz"
+
+def segment_index_path(log_file, n):
+    return f"{log_file}.{n}.idx"
+
+class EventLog:
+    def __init__(self, log_file, max_bytes=LOG_MAX_BYTES, backups=LOG_BACKUPS,
+                 flush_interval=FLUSH_INTERVAL, flush_events=FLUSH_EVENTS):
+        self.log_file = log_file
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.flush_interval = flush_interval
+        self.flush_events = flush_events
+        self._pending = []
+        self._log = None
+        self._index = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+        self._flusher = None
+        self._compressor = None
+        atexit.register(self.close)
+
+    def emit(self, event, **fields):
+        record = {"ts": round(time.time(), 6), "event": event}
+        record.update(fields)
+        line = json.dumps(record, default=str, separators=(",", ":")) + "\n"
+        with self._lock:
+            if self._closed:
+                return
+            self._pending.append((record["ts"], line.encode()))
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="tornet-eventlog", daemon=True)
+                self._flusher.start()
+            full = len(self._pending) >= self.flush_events
+        if full:
+            self._wake.set()
+
+    def _flush_loop(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.log_file) or ".", exist_ok=True)
+        log = open(self.log_file, "ab")
+        fcntl.flock(log, fcntl.LOCK_EX)
+        if self._log is not None:
+            self._log.close()
+            self._index.close()
+        self._log = log
+        self._index = open(index_path(self.log_file), "ab+")
+
+    def _last_indexed(self):
+        index_file = self._index.fileno()
+        size = os.fstat(index_file).st_size
+        if size < INDEX_RECORD.size:
+            return 0.0
+        offset = size - size % INDEX_RECORD.size - INDEX_RECORD.size
+        return INDEX_RECORD.unpack(os.pread(index_file, INDEX_RECORD.size, offset))[0]
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if not pending:
+                return
+            if self._log is None:
+                self._open()
+            else:
+                fcntl.flock(self._log, fcntl.LOCK_EX)
+            try:
+                while not same_file(self._log, self.log_file):
+                    self._open()
+                self._append(pending)
+            finally:
+                fcntl.flock(self._log, fcntl.LOCK_UN)
+
+    def _append(self, pending):
+        size = os.fstat(self._log.fileno()).st_size
+        last_ts = self._last_indexed()
+        data = []
+        index = []
+        for ts, line in pending:
+            if size and size + len(line) > self.max_bytes:
+                self._write(data, index)
+                data, index = [], []
+                self._rotate()
+                size = 0
+            last_ts = max(last_ts, ts)
+            index.append(INDEX_RECORD.pack(last_ts, size))
+            data.append(line)
+            size += len(line)
+        self._write(data, index)
+
+    def _write(self, data, index):
+        if not data:
+            return
+        self._log.write(b"".join(data))
+        self._log.flush()
+        self._index.write(b"".join(index))
+        self._index.flush()
+
+    def _rotate(self):
+        if self._compressor is not None:
+            self._compressor.join()
+        for n in range(self.backups, 0, -1):
+            for name in (segment_path, segment_index_path):
+                path = name(self.log_file, n)
+                if not os.path.exists(path):
+                    continue
+                if n == self.backups:
+                    os.remove(path)
+                else:
+                    os.replace(path, name(self.log_file, n + 1))
+        staged = f"{self.log_file}.1"
+        os.replace(self.log_file, staged)
+        os.replace(index_path(self.log_file), segment_index_path(self.log_file, 1))
+        self._open()
+        self._compressor = threading.Thread(target=compress_segment, args=(staged, segment_path(self.log_file, 1)),
+                                            name="tornet-eventlog-gzip", daemon=True)
+        self._compressor.start()
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            self.flush()
+        except OSError:
+            pass
+        with self._lock:
+            self._closed = True
+            if self._log is not None:
+                self._log.close()
+                self._index.close()
+                self._log = self._index = None
+        self._wake.set()
+        if self._compressor is not None:
+            self._compressor.join()
+
+def compress_segment(source, target):
+    import gzip
+
+    tmp_file = f"{target}.tmp"
+    with open(source, "rb") as src, gzip.open(tmp_file, "wb", compresslevel=6) as dst:
+        shutil.copyfileobj(src, dst, 1024 * 1024)
+    os.replace(tmp_file, target)
+    os.remove(source)
+
+def read_index(path):
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size - os.fstat(f.fileno()).st_size % INDEX_RECORD.size
+            if size == 0:
+                return None
+            return mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+class IndexView:
+    def __init__(self, data):
+        self.data = data
+
+    def __len__(self):
+        return len(self.data) // INDEX_RECORD.size
+
+    def __getitem__(self, i):
+        return INDEX_RECORD.unpack_from(self.data, i * INDEX_RECORD.size)[0]
+
+    def offset(self, i):
+        return INDEX_RECORD.unpack_from(self.data, i * INDEX_RECORD.size)[1]
+
+def live_range(log_file, since=None, until=None):
+    data = read_index(index_path(log_file))
+    try:
+        log = open(log_file, "rb")
+    except OSError:
+        if data is not None:
+            data.close()
+        return
+    with log:
+        if data is None:
+            yield from filter_lines(log, since, until)
+            return
+        with data:
+            view = IndexView(data)
+            first = bisect.bisect_left(view, since) if since is not None else 0
+            last = bisect.bisect_right(view, until) if until is not None else len(view)
+            if first >= last:
+                return
+            stop = view.offset(last - 1) if until is not None else float("inf")
+            log.seek(view.offset(first))
+            while log.tell() <= stop:
+                line = log.readline()
+                if not line:
+                    return
+                yield line.decode(errors="replace")
+
+def segment_overlaps(index_file, since, until):
+    data = read_index(index_file)
+    if data is None:
+        return True
+    with data:
+        view = IndexView(data)
+        first, last = view[0], view[len(view) - 1]
+    return not ((since is not None and last < since) or (until is not None and first > until))
+
+def filter_lines(lines, since, until):
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode(errors="replace")
+        try:
+            ts = json.loads(line)["ts"]
+        except (ValueError, KeyError, TypeError):
+            continue
+        if (since is None or ts >= since) and (until is None or ts <= until):
+            yield line
+
+def open_segment(log_file, n):
+    import gzip
+
+    path = segment_path(log_file, n)
+    if os.path.exists(path):
+        return gzip.open(path, "rb")
+    staged = f"{log_file}.{n}"
+    if os.path.exists(staged):
+        return open(staged, "rb")
+    return None
+
+def read_range(log_file, since=None, until=None, backups=LOG_BACKUPS):
+    for n in range(backups, 0, -1):
+        if not segment_overlaps(segment_index_path(log_file, n), since, until):
+            continue
+        try:
+            segment = open_segment(log_file, n)
+            if segment is None:
+                continue
+            with segment:
+                yield from filter_lines(segment, since, until)
+        except (OSError, EOFError):
+            continue
+    yield from live_range(log_file, since, until)
+
+class Watcher:
+    def __init__(self, directory, mask=IN_MODIFY | IN_CREATE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE):
+        import ctypes
+        import ctypes.util
+
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, f"inotify_add_watch failed for {directory}")
+
+    def wait(self, timeout=None):
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 65536)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + INOTIFY_EVENT.size <= len(data):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+            events.append((mask, os.fsdecode(name)))
+            offset += INOTIFY_EVENT.size + length
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+def follow(log_file, timeout=5.0):
+    directory = os.path.dirname(log_file) or "."
+    os.makedirs(directory, exist_ok=True)
+    try:
+        watcher = Watcher(directory)
+    except (OSError, AttributeError):
+        watcher = None
+
+    f = None
+    from_end = os.path.exists(log_file)
+    try:
+        while True:
+            if f is None and os.path.exists(log_file):
+                f = open(log_file, "rb")
+                if from_end:
+                    f.seek(0, os.SEEK_END)
+            if f is not None:
+                yield from read_complete_lines(f)
+                if not same_file(f, log_file):
+                    yield from read_complete_lines(f)
+                    f.close()
+                    f = None
+                    from_end = False
+                    continue
+            if watcher is not None:
+                watcher.wait(timeout)
+            else:
+                time.sleep(0.5)
+    finally:
+        if f is not None:
+            f.close()
+        if watcher is not None:
+            watcher.close()
+
+def read_complete_lines(f):
+    while True:
+        position = f.tell()
+        line = f.readline()
+        if not line:
+            return
+        if not line.endswith(b"\n"):
+            f.seek(position)
+            return
+        yield line.decode(errors="replace")
+
+def same_file(f, path):
+    try:
+        return os.fstat(f.fileno()).st_ino == os.stat(path).st_ino
+    except OSError:
+        return False
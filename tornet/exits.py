@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+
+import os
+import json
+import time
+import threading
+
+from .control import is_general_circuit
+
+EXIT_SCORES_FILE = os.path.expanduser("~/.tornet/exit_scores.json")
+HALF_LIFE = 6 * 3600
+SCORE_DECAY = 0.3
+MIN_SAMPLES = 2
+MAX_TTFB = 3.0
+MIN_THROUGHPUT = 50 * 1024
+REFERENCE_BYTES = 256 * 1024
+UNKNOWN_TTFB = 1.0
+FAILURE_PENALTY = 5.0
+EXCLUDE_LIMIT = 200
+MAX_EXITS = 5000
+SAVE_INTERVAL = 30
+PROBE_BYTES = 1024 * 1024
+PROBE_TIMEOUT = 20
+MONITOR_INTERVAL = 30
+
+class ExitScore:
+    def __init__(self, fingerprint, ttfb=None, throughput=None, samples=0.0, failures=0.0, updated=None):
+        self.fingerprint = fingerprint
+        self.ttfb = ttfb
+        self.throughput = throughput
+        self.samples = samples
+        self.failures = failures
+        self.updated = updated if updated is not None else time.time()
+
+    def decay(self, now):
+        return 0.5 ** (max(now - self.updated, 0) / HALF_LIFE)
+
+    def weight(self, now):
+        return self.samples * self.decay(now)
+
+    def record(self, ttfb=None, throughput=None, failed=False, now=None):
+        now = time.time() if now is None else now
+        factor = self.decay(now)
+        self.samples *= factor
+        self.failures *= factor
+        if failed:
+            self.failures += 1
+        if ttfb is not None:
+            self.ttfb = ttfb if self.ttfb is None else self.ttfb + SCORE_DECAY * (ttfb - self.ttfb)
+        if throughput is not None:
+            self.throughput = (throughput if self.throughput is None
+                               else self.throughput + SCORE_DECAY * (throughput - self.throughput))
+        self.samples += 1
+        self.updated = now
+
+    def cost(self, now=None):
+        now = time.time() if now is None else now
+        ttfb = self.ttfb if self.ttfb is not None else UNKNOWN_TTFB
+        transfer = REFERENCE_BYTES / self.throughput if self.throughput else 0.0
+        return ttfb + transfer + FAILURE_PENALTY * self.failures * self.decay(now)
+
+    def slow(self, max_ttfb, min_throughput, now=None):
+        now = time.time() if now is None else now
+        if self.weight(now) < MIN_SAMPLES:
+            return False
+        if self.failures * self.decay(now) >= MIN_SAMPLES:
+            return True
+        if max_ttfb and self.ttfb is not None and self.ttfb > max_ttfb:
+            return True
+        return bool(min_throughput and self.throughput is not None and self.throughput < min_throughput)
+
+    def as_dict(self):
+        return {
+            "ttfb": self.ttfb,
+            "throughput": self.throughput,
+            "samples": round(self.samples, 3),
+            "failures": round(self.failures, 3),
+            "updated": self.updated,
+        }
+
+class ExitScores:
+    def __init__(self, scores_file=None, max_ttfb=MAX_TTFB, min_throughput=MIN_THROUGHPUT):
+        self.scores_file = scores_file
+        self.max_ttfb = max_ttfb
+        self.min_throughput = min_throughput
+        self.exits = {}
+        self._saved_at = 0.0
+        self._dirty = False
+        self._lock = threading.Lock()
+        if scores_file:
+            self.load()
+
+    def __len__(self):
+        return len(self.exits)
+
+    def __contains__(self, fingerprint):
+        return fingerprint in self.exits
+
+    def load(self):
+        try:
+            with open(self.scores_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        with self._lock:
+            for fingerprint, entry in data.items():
+                try:
+                    self.exits[fingerprint] = ExitScore(fingerprint, **entry)
+                except TypeError:
+                    continue
+
+    def save(self):
+        if not self.scores_file:
+            return
+        with self._lock:
+            self._prune()
+            data = {fingerprint: score.as_dict() for fingerprint, score in self.exits.items()}
+            self._dirty = False
+            self._saved_at = time.monotonic()
+        os.makedirs(os.path.dirname(self.scores_file), exist_ok=True)
+        tmp_file = f"{self.scores_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            json.dump(data, f, separators=(",", ":"))
+        os.replace(tmp_file, self.scores_file)
+
+    def maybe_save(self):
+        if self._dirty and time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            try:
+                self.save()
+            except OSError:
+                pass
+
+    def _prune(self):
+        if len(self.exits) <= MAX_EXITS:
+            return
+        now = time.time()
+        ranked = sorted(self.exits.values(), key=lambda score: score.weight(now), reverse=True)
+        self.exits = {score.fingerprint: score for score in ranked[:MAX_EXITS]}
+
+    def record(self, fingerprint, ttfb=None, throughput=None, failed=False):
+        if not fingerprint:
+            return None
+        with self._lock:
+            score = self.exits.get(fingerprint)
+            if score is None:
+                score = self.exits[fingerprint] = ExitScore(fingerprint)
+            score.record(ttfb, throughput, failed)
+            self._dirty = True
+        self.maybe_save()
+        return score
+
+    def get(self, fingerprint):
+        with self._lock:
+            return self.exits.get(fingerprint)
+
+    def cost(self, fingerprint):
+        score = self.get(fingerprint)
+        return score.cost() if score is not None else UNKNOWN_TTFB
+
+    def is_slow(self, fingerprint):
+        score = self.get(fingerprint)
+        return score is not None and score.slow(self.max_ttfb, self.min_throughput)
+
+    def slow_exits(self, limit=EXCLUDE_LIMIT):
+        now = time.time()
+        with self._lock:
+            slow = [score for score in self.exits.values() if score.slow(self.max_ttfb, self.min_throughput, now)]
+        slow.sort(key=lambda score: score.cost(now), reverse=True)
+        return [score.fingerprint for score in slow[:limit]]
+
+    def report(self, limit=None):
+        now = time.time()
+        with self._lock:
+            scores = sorted(self.exits.values(), key=lambda score: score.cost(now))
+        rows = [{"fingerprint": score.fingerprint, "cost": round(score.cost(now), 4),
+                 "slow": score.slow(self.max_ttfb, self.min_throughput, now), **score.as_dict()}
+                for score in scores]
+        return rows[:limit] if limit else rows
+
+def measure(session, url, timeout=PROBE_TIMEOUT, max_bytes=PROBE_BYTES):
+    started = time.monotonic()
+    with session.get(url, stream=True, timeout=timeout) as response:
+        response.raise_for_status()
+        chunks = response.iter_content(16384)
+        first = next(chunks, b"")
+        first_byte = time.monotonic()
+        body = [first]
+        received = len(first)
+        for chunk in chunks:
+            received += len(chunk)
+            if len(body) < 4:
+                body.append(chunk)
+            if received >= max_bytes or time.monotonic() - started > timeout:
+                break
+    finished = time.monotonic()
+    transfer = finished - first_byte
+    return {
+        "ttfb": first_byte - started,
+        "bytes": received,
+        "throughput": received / transfer if received > len(first) and transfer > 0 else None,
+        "body": b"".join(body)[:256],
+    }
+
+def probe_exit(scores, session, fingerprint, echo_url, expected_ip=None, url=None, timeout=PROBE_TIMEOUT):
+    try:
+        echo = measure(session, echo_url, timeout, 256)
+    except Exception:
+        return scores.record(fingerprint, failed=True)
+    if expected_ip and echo["body"].decode(errors="replace").strip() != expected_ip:
+        return None
+    throughput = None
+    if url:
+        try:
+            throughput = measure(session, url, timeout)["throughput"]
+        except Exception:
+            return scores.record(fingerprint, ttfb=echo["ttfb"], failed=True)
+    return scores.record(fingerprint, ttfb=echo["ttfb"], throughput=throughput)
+
+def apply_exclusions(controller, scores, current=None):
+    excluded = scores.slow_exits()
+    if excluded == current:
+        return current
+    controller.set_conf("ExcludeExitNodes", ",".join(f"${fingerprint}" for fingerprint in excluded) or None)
+    return excluded
+
+class ExitMonitor:
+    def __init__(self, controller, scores, interval=MONITOR_INTERVAL, on_close=None):
+        self.controller = controller
+        self.scores = scores
+        self.interval = interval
+        self.on_close = on_close
+        self.excluded = None
+        self.closed = 0
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="tornet-exits", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(5)
+        if self.excluded:
+            try:
+                self.controller.reset_conf("ExcludeExitNodes")
+            except Exception:
+                pass
+        try:
+            self.scores.save()
+        except OSError:
+            pass
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            try:
+                self.check()
+            except Exception:
+                pass
+            self._stopped.wait(self.interval)
+
+    def check(self):
+        from stem import CircStatus
+
+        self.excluded = apply_exclusions(self.controller, self.scores, self.excluded)
+        closed = []
+        for circuit in self.controller.get_circuits([]):
+            if circuit.status != CircStatus.BUILT or not circuit.path or not is_general_circuit(circuit):
+                continue
+            fingerprint = circuit.path[-1][0]
+            if self.scores.is_slow(fingerprint):
+                try:
+                    self.controller.close_circuit(circuit.id)
+                except Exception:
+                    continue
+                closed.append((circuit.id, fingerprint))
+        self.closed += len(closed)
+        if closed and self.on_close is not None:
+            self.on_close(closed)
+        self.scores.maybe_save()
+        return closed
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+
+import os
+import mmap
+import socket
+import array
+import struct
+import bisect
+import threading
+
+GEOIP_FILE = "/usr/share/tor/geoip"
+GEOIP6_FILE = "/usr/share/tor/geoip6"
+CACHE_FILE = os.path.expanduser("~/.tornet/geoip.cache")
+
+CACHE_MAGIC = b"TNGEOIP1"
+CACHE_HEADER = struct.Struct("=8s4qIII")
+
+class AddressColumn:
+    def __init__(self, buffer, width):
+        self.buffer = buffer
+        self.width = width
+
+    def __len__(self):
+        return len(self.buffer) // self.width
+
+    def __getitem__(self, i):
+        start = i * self.width
+        return bytes(self.buffer[start:start + self.width])
+
+def source_signature(path):
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError:
+        return 0, 0
+
+def parse_geoip(path, ipv6=False):
+    rows = []
+    try:
+        with open(path, "r") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                try:
+                    low, high, code = line.split(",")
+                    if ipv6:
+                        low = socket.inet_pton(socket.AF_INET6, low)
+                        high = socket.inet_pton(socket.AF_INET6, high)
+                    else:
+                        low, high = int(low), int(high)
+                except (ValueError, OSError):
+                    continue
+                rows.append((low, high, code.upper()))
+    except OSError:
+        pass
+    rows.sort()
+    return rows
+
+def padded(size, alignment=8):
+    return size + (-size % alignment)
+
+def pad(data, alignment=8):
+    return data + b"\0" * (padded(len(data), alignment) - len(data))
+
+class GeoIPIndex:
+    def __init__(self, codes, v4_starts, v4_ends, v4_codes, v6_starts, v6_ends, v6_codes, source=None):
+        self.codes = codes
+        self.v4_starts = v4_starts
+        self.v4_ends = v4_ends
+        self.v4_codes = v4_codes
+        self.v6_starts = v6_starts
+        self.v6_ends = v6_ends
+        self.v6_codes = v6_codes
+        self._source = source
+
+    def __len__(self):
+        return len(self.v4_starts) + len(self.v6_starts)
+
+    @classmethod
+    def from_files(cls, geoip_file=GEOIP_FILE, geoip6_file=GEOIP6_FILE):
+        v4_rows = parse_geoip(geoip_file)
+        v6_rows = parse_geoip(geoip6_file, ipv6=True)
+        codes = sorted({code for _, _, code in v4_rows} | {code for _, _, code in v6_rows})
+        code_index = {code: i for i, code in enumerate(codes)}
+        return cls(
+            codes,
+            array.array("I", (low for low, _, _ in v4_rows)),
+            array.array("I", (high for _, high, _ in v4_rows)),
+            array.array("H", (code_index[code] for _, _, code in v4_rows)),
+            AddressColumn(b"".join(low for low, _, _ in v6_rows), 16),
+            AddressColumn(b"".join(high for _, high, _ in v6_rows), 16),
+            array.array("H", (code_index[code] for _, _, code in v6_rows)),
+        )
+
+    def save(self, cache_file, signature):
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        header = CACHE_HEADER.pack(CACHE_MAGIC, *signature, len(self.codes), len(self.v4_starts), len(self.v6_starts))
+        blobs = [
+            header,
+            "".join(self.codes).encode("ascii"),
+            self.v4_starts.tobytes(),
+            self.v4_ends.tobytes(),
+            self.v4_codes.tobytes(),
+            bytes(self.v6_starts.buffer),
+            bytes(self.v6_ends.buffer),
+            self.v6_codes.tobytes(),
+        ]
+        tmp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "wb") as f:
+            for blob in blobs:
+                f.write(pad(blob))
+        os.replace(tmp_file, cache_file)
+
+    @classmethod
+    def from_cache(cls, cache_file, signature):
+        with open(cache_file, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        magic, *cached_signature, ncodes, n4, n6 = CACHE_HEADER.unpack_from(view)
+        if magic != CACHE_MAGIC or tuple(cached_signature) != tuple(signature):
+            view.release()
+            mapped.close()
+            return None
+
+        offset = padded(CACHE_HEADER.size)
+
+        def take(size):
+            nonlocal offset
+            chunk = view[offset:offset + size]
+            offset += padded(size)
+            return chunk
+
+        codes_blob = bytes(take(ncodes * 2)).decode("ascii")
+        codes = [codes_blob[i:i + 2] for i in range(0, len(codes_blob), 2)]
+        return cls(
+            codes,
+            take(n4 * 4).cast("I"),
+            take(n4 * 4).cast("I"),
+            take(n4 * 2).cast("H"),
+            AddressColumn(take(n6 * 16), 16),
+            AddressColumn(take(n6 * 16), 16),
+            take(n6 * 2).cast("H"),
+            source=mapped,
+        )
+
+    @classmethod
+    def load(cls, geoip_file=GEOIP_FILE, geoip6_file=GEOIP6_FILE, cache_file=CACHE_FILE):
+        signature = source_signature(geoip_file) + source_signature(geoip6_file)
+        if cache_file:
+            try:
+                index = cls.from_cache(cache_file, signature)
+                if index is not None:
+                    return index
+            except (OSError, ValueError, struct.error, TypeError):
+                pass
+        index = cls.from_files(geoip_file, geoip6_file)
+        if cache_file and len(index):
+            try:
+                index.save(cache_file, signature)
+            except OSError:
+                pass
+        return index
+
+    def country(self, ip):
+        try:
+            key = int.from_bytes(socket.inet_pton(socket.AF_INET, ip), "big")
+        except (OSError, TypeError):
+            return self.country6(ip)
+        i = bisect.bisect_right(self.v4_starts, key) - 1
+        if i >= 0 and key <= self.v4_ends[i]:
+            return self.codes[self.v4_codes[i]]
+        return None
+
+    def country6(self, ip):
+        try:
+            key = socket.inet_pton(socket.AF_INET6, ip)
+        except (OSError, TypeError):
+            return None
+        i = bisect.bisect_right(self.v6_starts, key) - 1
+        if i >= 0 and key <= self.v6_ends[i]:
+            return self.codes[self.v6_codes[i]]
+        return None
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = GeoIPIndex.load()
+        return _index if len(_index) else None
+
+def lookup_country(ip):
+    index = get_index()
+    if index is None:
+        return None
+    return index.country(ip)
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+
+import os
+import threading
+from collections import deque, Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from .control import tor_proxies, SOCKS_PORT
+from .sessions import new_session, new_credentials
+from .ipcheck import fetch_ip
+from .metrics import EXIT_REUSES
+
+HISTORY_FILE = os.path.expanduser("~/.tornet/exit_history")
+HISTORY_WINDOW = 20
+UNIQUE_RETRIES = 3
+
+class ExitHistory:
+    def __init__(self, window=HISTORY_WINDOW, history_file=None):
+        self.window = window
+        self.history_file = history_file
+        self.recent = deque(maxlen=window)
+        self.counts = Counter()
+        self.reuses = 0
+        self._lock = threading.Lock()
+        if history_file:
+            self.load()
+
+    def __contains__(self, ip):
+        with self._lock:
+            return ip in self.counts
+
+    def __len__(self):
+        return len(self.recent)
+
+    def add(self, ip):
+        with self._lock:
+            if len(self.recent) == self.recent.maxlen:
+                oldest = self.recent[0]
+                self.counts[oldest] -= 1
+                if not self.counts[oldest]:
+                    del self.counts[oldest]
+            self.recent.append(ip)
+            self.counts[ip] += 1
+
+    def record_reuse(self):
+        with self._lock:
+            self.reuses += 1
+        EXIT_REUSES.inc()
+
+    def load(self):
+        try:
+            with open(self.history_file, "r") as f:
+                lines = [line.strip() for line in f if line.strip()]
+        except OSError:
+            return
+        for ip in lines[-self.window:]:
+            self.add(ip)
+
+    def save(self):
+        if not self.history_file:
+            return
+        os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+        with self._lock:
+            ips = list(self.recent)
+        tmp_file = f"{self.history_file}.{os.getpid()}.tmp"
+        with open(tmp_file, "w") as f:
+            f.write("".join(f"{ip}\n" for ip in ips))
+        os.replace(tmp_file, self.history_file)
+
+class Identity:
+    def __init__(self, username, password, ip, socks_port=SOCKS_PORT):
+        self.username = username
+        self.password = password
+        self.ip = ip
+        self.socks_port = socks_port
+
+    @property
+    def proxies(self):
+        return tor_proxies(self.socks_port, username=self.username, password=self.password)
+
+    def session(self):
+        return new_session(self.socks_port, username=self.username, password=self.password)
+
+    def as_dict(self):
+        return {"ip": self.ip, "username": self.username, "password": self.password, "socks_port": self.socks_port}
+
+def new_isolated_identity(socks_port=SOCKS_PORT):
+    username, password = new_credentials()
+    session = new_session(socks_port, pool_size=1, username=username, password=password)
+    try:
+        ip = fetch_ip(session=session)
+    finally:
+        session.close()
+    return Identity(username, password, ip, socks_port)
+
+def distinct_identities(count, socks_port=SOCKS_PORT, history=None, retries=UNIQUE_RETRIES, workers=8):
+    identities = {}
+    attempts = 0
+    budget = count * (retries + 1)
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, count))) as executor:
+        while len(identities) < count and attempts < budget:
+            wanted = min(count - len(identities), budget - attempts)
+            attempts += wanted
+            futures = [executor.submit(new_isolated_identity, socks_port) for _ in range(wanted)]
+            for future in futures:
+                identity = future.result()
+                if identity.ip is None:
+                    continue
+                if identity.ip in identities or (history is not None and identity.ip in history):
+                    if history is not None:
+                        history.record_reuse()
+                    continue
+                if len(identities) < count:
+                    identities[identity.ip] = identity
+    if len(identities) < count:
+        raise RuntimeError(f"Only found {len(identities)} distinct exit IPs out of {count} requested")
+    if history is not None:
+        for ip in identities:
+            history.add(ip)
+    return list(identities.values())
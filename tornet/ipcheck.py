@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+
+import time
+import ipaddress
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from .sessions import get_session
+from .metrics import IP_CHECK_SECONDS, IP_CHECK_FAILURES
+
+DEFAULT_BACKENDS = [
+    "https://api.ipify.org",
+    "https://icanhazip.com",
+    "https://checkip.amazonaws.com",
+    "https://ifconfig.me/ip",
+]
+CHECK_TIMEOUT = 10
+HEDGE_WIDTH = 3
+LATENCY_DECAY = 0.3
+FAILURE_PENALTY = 5.0
+
+class Backend:
+    def __init__(self, url):
+        self.url = url
+        self.latency = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+
+    @property
+    def score(self):
+        latency = self.latency if self.latency is not None else 1.0
+        return latency + FAILURE_PENALTY * self.consecutive_failures
+
+    def record_success(self, latency):
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += LATENCY_DECAY * (latency - self.latency)
+        self.successes += 1
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+
+    def stats(self):
+        return {
+            "url": self.url,
+            "latency": round(self.latency, 4) if self.latency is not None else None,
+            "successes": self.successes,
+            "failures": self.failures,
+            "score": round(self.score, 4),
+        }
+
+_backends = [Backend(url) for url in DEFAULT_BACKENDS]
+_lock = threading.Lock()
+_executor = None
+
+def set_backends(urls, include_defaults=True):
+    global _backends
+    ordered = list(urls) + (DEFAULT_BACKENDS if include_defaults else [])
+    with _lock:
+        known = {backend.url: backend for backend in _backends}
+        _backends = [known.get(url) or Backend(url) for url in dict.fromkeys(ordered)]
+
+def ranked_backends():
+    with _lock:
+        return sorted(_backends, key=lambda backend: backend.score)
+
+def backend_stats():
+    return [backend.stats() for backend in ranked_backends()]
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="tornet-ipcheck")
+        return _executor
+
+def query_backend(backend, session, timeout, settled=None):
+    if settled is not None and settled.is_set():
+        return None
+    start = time.monotonic()
+    try:
+        response = session.get(backend.url, timeout=timeout)
+        response.raise_for_status()
+        ip = str(ipaddress.ip_address(response.text.strip()))
+    except Exception:
+        with _lock:
+            if settled is not None and settled.is_set():
+                return None
+            backend.record_failure()
+        IP_CHECK_FAILURES.inc(backend=backend.url)
+        raise
+    latency = time.monotonic() - start
+    with _lock:
+        if settled is not None and settled.is_set():
+            return None
+        backend.record_success(latency)
+    IP_CHECK_SECONDS.observe(latency, backend=backend.url)
+    return ip
+
+def first_valid(backends, session, deadline):
+    executor = get_executor()
+    settled = threading.Event()
+    pending = {executor.submit(query_backend, backend, session, max(deadline - time.monotonic(), 0.1), settled)
+               for backend in backends}
+    try:
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None and future.result() is not None:
+                    with _lock:
+                        settled.set()
+                    return future.result()
+        return None
+    finally:
+        for future in pending:
+            future.cancel()
+
+def fetch_ip(socks_port=None, timeout=CHECK_TIMEOUT, width=HEDGE_WIDTH, session=None):
+    deadline = time.monotonic() + timeout
+    session = session or get_session(socks_port)
+    backends = ranked_backends()
+    ip = first_valid(backends[:width], session, deadline)
+    if ip is None and len(backends) > width:
+        ip = first_valid(backends[width:], session, deadline)
+    return ip
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+
+import threading
+
+from .control import tor_proxies, SOCKS_PORT
+from .sessions import new_session, new_credentials
+from .ipcheck import fetch_ip, CHECK_TIMEOUT
+from .history import Identity
+
+class IsolatedSession:
+    def __init__(self, socks_port=SOCKS_PORT, prefix="tornet", pool_size=None, name=None):
+        self.socks_port = socks_port
+        self.prefix = prefix
+        self.pool_size = pool_size
+        self.name = name
+        self.rotations = 0
+        self._lock = threading.Lock()
+        self.username, self.password = new_credentials(prefix)
+        self._session = new_session(socks_port, pool_size, self.username, self.password)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __repr__(self):
+        return f"<IsolatedSession {self.name or self.username} port={self.socks_port}>"
+
+    @property
+    def session(self):
+        with self._lock:
+            return self._session
+
+    @property
+    def proxies(self):
+        return tor_proxies(self.socks_port, username=self.username, password=self.password)
+
+    @property
+    def headers(self):
+        return self.session.headers
+
+    @property
+    def cookies(self):
+        return self.session.cookies
+
+    def request(self, method, url, **kwargs):
+        return self.session.request(method, url, **kwargs)
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, data=None, json=None, **kwargs):
+        return self.request("POST", url, data=data, json=json, **kwargs)
+
+    def put(self, url, data=None, **kwargs):
+        return self.request("PUT", url, data=data, **kwargs)
+
+    def patch(self, url, data=None, **kwargs):
+        return self.request("PATCH", url, data=data, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request("DELETE", url, **kwargs)
+
+    def head(self, url, **kwargs):
+        kwargs.setdefault("allow_redirects", False)
+        return self.request("HEAD", url, **kwargs)
+
+    def options(self, url, **kwargs):
+        return self.request("OPTIONS", url, **kwargs)
+
+    def rotate(self, keep_cookies=False):
+        username, password = new_credentials(self.prefix)
+        session = new_session(self.socks_port, self.pool_size, username, password)
+        with self._lock:
+            old = self._session
+            session.headers.update(old.headers)
+            if keep_cookies:
+                session.cookies.update(old.cookies)
+            self._session = session
+            self.username, self.password = username, password
+            self.rotations += 1
+        old.close()
+        return self
+
+    def ip(self, timeout=CHECK_TIMEOUT):
+        return fetch_ip(timeout=timeout, session=self.session)
+
+    def identity(self):
+        return Identity(self.username, self.password, self.ip(), self.socks_port)
+
+    def close(self):
+        with self._lock:
+            session = self._session
+        session.close()
+
+class SessionFactory:
+    def __init__(self, socks_port=SOCKS_PORT, prefix="tornet", pool_size=1):
+        self.socks_port = socks_port
+        self.prefix = prefix
+        self.pool_size = pool_size
+        self._clients = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._clients)
+
+    def new(self, name=None):
+        return IsolatedSession(self.socks_port, self.prefix, self.pool_size, name)
+
+    def session(self, key):
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._clients[key] = self.new(key)
+            return client
+
+    def current(self):
+        return self.session(threading.get_ident())
+
+    def rotate(self, key, keep_cookies=False):
+        return self.session(key).rotate(keep_cookies)
+
+    def rotate_all(self, keep_cookies=False):
+        with self._lock:
+            clients = list(self._clients.values())
+        for client in clients:
+            client.rotate(keep_cookies)
+        return clients
+
+    def release(self, key):
+        with self._lock:
+            client = self._clients.pop(key, None)
+        if client is not None:
+            client.close()
+
+    def close(self):
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+
+import pwd
+import shutil
+import subprocess
+
+CHAIN = "TORNET-KILLSWITCH"
+NFT_TABLE = "tornet"
+LOCAL_NETWORKS = ("127.0.0.0/8", "192.168.0.0/16", "172.16.0.0/12", "10.0.0.0/8")
+LOCAL_NETWORKS6 = ("::1/128", "fe80::/10", "fc00::/7")
+TOR_USERS = ("debian-tor", "tor", "toranon", "_tor")
+IF_INET6 = "/proc/net/if_inet6"
+
+class KillSwitchError(Exception):
+    pass
+
+def tor_uid(users=TOR_USERS):
+    for user in users:
+        try:
+            return pwd.getpwnam(user).pw_uid
+        except KeyError:
+            continue
+    raise KillSwitchError(f"No Tor system user found (tried {', '.join(users)}); "
+                          "Tor's own connections could not be exempted")
+
+def ipv6_enabled(path=IF_INET6):
+    try:
+        with open(path, "r") as f:
+            return any(line.split()[-1] != "lo" for line in f if line.strip())
+    except OSError:
+        return False
+
+def iptables_rules(uid, networks=LOCAL_NETWORKS):
+    lines = ["*filter", f":{CHAIN} - [0:0]"]
+    for network in networks:
+        lines.append(f"-A {CHAIN} -d {network} -j ACCEPT")
+    lines.append(f"-A {CHAIN} -m owner --uid-owner {uid} -j ACCEPT")
+    lines.append(f"-A {CHAIN} -j DROP")
+    lines.append(f"-A OUTPUT -j {CHAIN}")
+    lines.append("COMMIT")
+    return "\n".join(lines) + "\n"
+
+def iptables_teardown(jump=True):
+    lines = ["*filter"]
+    if jump:
+        lines.append(f"-D OUTPUT -j {CHAIN}")
+    lines += [f"-F {CHAIN}", f"-X {CHAIN}", "COMMIT"]
+    return "\n".join(lines) + "\n"
+
+def nft_set(values):
+    return "{ " + ", ".join(str(value) for value in values) + " }"
+
+def nft_rules(uid):
+    lines = [
+        f"add table inet {NFT_TABLE}",
+        f"delete table inet {NFT_TABLE}",
+        f"table inet {NFT_TABLE} {{",
+        "    chain killswitch {",
+        "        type filter hook output priority 0; policy accept;",
+        f"        ip daddr {nft_set(LOCAL_NETWORKS)} accept",
+        f"        ip6 daddr {nft_set(LOCAL_NETWORKS6)} accept",
+        f"        meta skuid {uid} accept",
+        "        drop",
+        "    }",
+        "}",
+    ]
+    return "\n".join(lines) + "\n"
+
+def run_tool(cmd, script=None):
+    return subprocess.run(cmd, input=script, capture_output=True, text=True)
+
+def apply_script(cmd, script):
+    result = run_tool(cmd, script)
+    if result.returncode != 0:
+        raise KillSwitchError(result.stderr.strip() or f"{cmd[0]} exited with {result.returncode}")
+
+class IptablesKillSwitch:
+    name = "iptables"
+
+    def __init__(self, iptables, restore, ip6tables=None, ip6restore=None):
+        self.iptables = iptables
+        self.restore = restore
+        self.ip6tables = ip6tables
+        self.ip6restore = ip6restore
+
+    @property
+    def has_ipv6(self):
+        return bool(self.ip6tables and self.ip6restore)
+
+    def enabled(self):
+        return run_tool([self.iptables, "-w", "-S", CHAIN]).returncode == 0
+
+    def enable(self, uid):
+        if not self.has_ipv6 and ipv6_enabled():
+            raise KillSwitchError("IPv6 is enabled but ip6tables-restore was not found; "
+                                  "IPv6 traffic would bypass the kill switch")
+        apply_script([self.restore, "-w", "--noflush"], iptables_rules(uid))
+        if not self.has_ipv6:
+            return
+        try:
+            apply_script([self.ip6restore, "-w", "--noflush"],
+                         iptables_rules(uid, LOCAL_NETWORKS6))
+        except KillSwitchError:
+            self._teardown(self.iptables, self.restore)
+            raise
+
+    def disable(self):
+        self._teardown(self.iptables, self.restore)
+        if self.has_ipv6 and run_tool([self.ip6tables, "-w", "-S", CHAIN]).returncode == 0:
+            self._teardown(self.ip6tables, self.ip6restore)
+
+    def _teardown(self, iptables, restore):
+        jump = run_tool([iptables, "-w", "-C", "OUTPUT", "-j", CHAIN]).returncode == 0
+        apply_script([restore, "-w", "--noflush"], iptables_teardown(jump))
+
+class NftKillSwitch:
+    name = "nftables"
+
+    def __init__(self, nft):
+        self.nft = nft
+
+    def enabled(self):
+        return run_tool([self.nft, "list", "table", "inet", NFT_TABLE]).returncode == 0
+
+    def enable(self, uid):
+        apply_script([self.nft, "-f", "-"], nft_rules(uid))
+
+    def disable(self):
+        apply_script([self.nft, "-f", "-"], f"delete table inet {NFT_TABLE}\n")
+
+def find_kill_switch():
+    iptables, restore = shutil.which("iptables"), shutil.which("iptables-restore")
+    ip6tables, ip6restore = shutil.which("ip6tables"), shutil.which("ip6tables-restore")
+    nft = shutil.which("nft")
+    if iptables and restore and (ip6tables and ip6restore or not nft or not ipv6_enabled()):
+        return IptablesKillSwitch(iptables, restore, ip6tables, ip6restore)
+    if nft:
+        return NftKillSwitch(nft)
+    if iptables and restore:
+        return IptablesKillSwitch(iptables, restore)
+    return None
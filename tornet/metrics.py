@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+
+import bisect
+import threading
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+BOOTSTRAP_BUCKETS = (1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+METRICS_HOST = "127.0.0.1"
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+def format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, (), value) for key, value in sorted(self._values.items())]
+
+    def snapshot(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        if not self.labelnames:
+            return items[0][1] if items else 0
+        return {",".join(key): value for key, value in items}
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+class HistogramValue:
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = HistogramValue(self.buckets)
+            entry.counts[index] += 1
+            entry.count += 1
+            entry.sum += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((key, list(entry.counts), entry.count, entry.sum) for key, entry in self._values.items())
+        for key, counts, count, total in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", key, (("le", format_value(float(bound))),), cumulative))
+            samples.append((f"{self.name}_count", key, (), count))
+            samples.append((f"{self.name}_sum", key, (), total))
+        return samples
+
+    def snapshot(self):
+        with self._lock:
+            items = sorted((key, entry.count, entry.sum) for key, entry in self._values.items())
+        values = {
+            ",".join(key): {"count": count, "sum": round(total, 6), "mean": round(total / count, 6)}
+            for key, count, total in items
+        }
+        if not self.labelnames:
+            return values.get("", {"count": 0, "sum": 0.0, "mean": None})
+        return values
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self.metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, key, extra, value in metric.samples():
+                lines.append(f"{name}{format_labels(metric.labelnames, key, extra)} {format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        return {metric.name: metric.snapshot() for metric in metrics}
+
+    def reset(self):
+        with self._lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            metric.clear()
+
+REGISTRY = Registry()
+
+ROTATION_SECONDS = REGISTRY.histogram(
+    "tornet_rotation_seconds", "Time spent rotating the exit, by phase", ["phase"])
+ROTATIONS = REGISTRY.counter(
+    "tornet_rotations_total", "Completed rotations, by how the new exit IP was found", ["source"])
+ROTATION_FAILURES = REGISTRY.counter(
+    "tornet_rotation_failures_total", "Rotations that failed or fell back, by cause", ["cause"])
+BOOTSTRAP_SECONDS = REGISTRY.histogram(
+    "tornet_bootstrap_seconds", "Time for Tor to finish bootstrapping", buckets=BOOTSTRAP_BUCKETS)
+BOOTSTRAP_FAILURES = REGISTRY.counter(
+    "tornet_bootstrap_failures_total", "Bootstraps that hit their deadline")
+IP_CHECK_SECONDS = REGISTRY.histogram(
+    "tornet_ip_check_seconds", "Latency of successful IP-echo requests, by backend", ["backend"])
+IP_CHECK_FAILURES = REGISTRY.counter(
+    "tornet_ip_check_failures_total", "Failed IP-echo requests, by backend", ["backend"])
+EXIT_REUSES = REGISTRY.counter(
+    "tornet_exit_reuses_total", "Rotations that landed on a recently used exit IP")
+RELAYED_BYTES = REGISTRY.counter(
+    "tornet_relayed_bytes_total", "Bytes relayed by the rotating SOCKS5 proxy", ["direction"])
+PROXY_CONNECTIONS = REGISTRY.counter(
+    "tornet_proxy_connections_total", "Connections handled by the rotating SOCKS5 proxy, by outcome", ["outcome"])
+
+def serve_metrics(port, host=METRICS_HOST, registry=REGISTRY):
+    import json
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/metrics":
+                body, content_type = registry.render().encode(), CONTENT_TYPE
+            elif path == "/metrics.json":
+                body, content_type = json.dumps(registry.snapshot()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, name="tornet-metrics", daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import random
+import shutil
+import subprocess
+import threading
+import itertools
+from contextlib import contextmanager
+
+from .control import (
+    get_controller, new_identity, tor_proxies, wait_for_bootstrap,
+    SOCKS_HOST, CONTROL_HOST, CIRCUIT_TIMEOUT, BOOTSTRAP_TIMEOUT
+)
+
+POOL_DIR = os.path.expanduser("~/.tornet/pool")
+BASE_SOCKS_PORT = 9060
+BASE_CONTROL_PORT = 9160
+STRATEGIES = ("round_robin", "least_loaded")
+IDLE_TIMEOUT = 600
+MEMORY_BUDGET_MB = 512
+INSTANCE_MEMORY_MB = 64
+
+class TorInstance:
+    def __init__(self, index, socks_port, control_port, data_dir, country=None):
+        self.index = index
+        self.socks_port = socks_port
+        self.control_port = control_port
+        self.data_dir = data_dir
+        self.country = country
+        self.process = None
+        self.active = 0
+        self.last_used = 0.0
+        self.ready = False
+        self.starting = threading.Lock()
+
+    @property
+    def torrc_file(self):
+        return os.path.join(self.data_dir, "torrc")
+
+    @property
+    def log_file(self):
+        return os.path.join(self.data_dir, "notice.log")
+
+    @property
+    def proxies(self):
+        return tor_proxies(self.socks_port)
+
+    def torrc(self):
+        lines = [
+            f"SocksPort {SOCKS_HOST}:{self.socks_port}",
+            f"ControlPort {CONTROL_HOST}:{self.control_port}",
+            "CookieAuthentication 1",
+            f"DataDirectory {self.data_dir}",
+            f"Log notice file {self.log_file}",
+            f"__OwningControllerProcess {os.getpid()}",
+        ]
+        if self.country:
+            lines.append(f"ExitNodes {{{self.country.upper()}}}")
+            lines.append("StrictNodes 1")
+        return "\n".join(lines) + "\n"
+
+    def start(self, tor_binary="tor"):
+        if self.is_running():
+            return
+        os.makedirs(self.data_dir, mode=0o700, exist_ok=True)
+        with open(self.torrc_file, "w") as f:
+            f.write(self.torrc())
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+        self.process = subprocess.Popen(
+            [tor_binary, "-f", self.torrc_file],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+
+    def stop(self, timeout=10):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        self.process = None
+        self.ready = False
+
+    def is_running(self):
+        return self.process is not None and self.process.poll() is None
+
+    def memory_mb(self):
+        if not self.is_running():
+            return 0.0
+        try:
+            with open(f"/proc/{self.process.pid}/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1]) / 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return float(INSTANCE_MEMORY_MB)
+
+    def wait_until_ready(self, timeout=BOOTSTRAP_TIMEOUT):
+        wait_for_bootstrap(self.control_port, self.socks_port, timeout, self.log_file)
+
+    def controller(self):
+        return get_controller(self.control_port)
+
+    def new_identity(self, timeout=CIRCUIT_TIMEOUT):
+        controller = self.controller()
+        if controller is None:
+            return None
+        return new_identity(controller, timeout)
+
+class TorPool:
+    def __init__(self, instances=1, base_socks_port=BASE_SOCKS_PORT, base_control_port=BASE_CONTROL_PORT,
+                 data_root=POOL_DIR, country=None, tor_binary="tor"):
+        if instances < 1:
+            raise ValueError("A Tor pool needs at least one instance")
+        self.tor_binary = tor_binary
+        self.base_socks_port = base_socks_port
+        self.base_control_port = base_control_port
+        self.data_root = data_root
+        self.country = country
+        self.instances = [self._instance(i) for i in range(instances)]
+        self._cycle = itertools.cycle(self.instances)
+        self._lock = threading.Lock()
+
+    def _instance(self, i):
+        return TorInstance(
+            i,
+            self.base_socks_port + i,
+            self.base_control_port + i,
+            os.path.join(self.data_root, f"tor{i}"),
+            self.country,
+        )
+
+    def __len__(self):
+        return len(self.instances)
+
+    def __iter__(self):
+        return iter(self.instances)
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def start(self):
+        if not shutil.which(self.tor_binary):
+            raise FileNotFoundError(f"Tor binary '{self.tor_binary}' not found in PATH")
+        for instance in self.instances:
+            instance.start(self.tor_binary)
+
+    def wait_until_ready(self, timeout=BOOTSTRAP_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        for instance in self.instances:
+            instance.wait_until_ready(max(deadline - time.monotonic(), 0))
+
+    def stop(self):
+        for instance in self.instances:
+            instance.stop()
+
+    def resize(self, instances, timeout=BOOTSTRAP_TIMEOUT):
+        if instances < 1:
+            raise ValueError("A Tor pool needs at least one instance")
+        with self._lock:
+            current = len(self.instances)
+        added = [self._instance(i) for i in range(current, instances)]
+        for instance in added:
+            instance.start(self.tor_binary)
+        deadline = time.monotonic() + timeout
+        try:
+            for instance in added:
+                instance.wait_until_ready(max(deadline - time.monotonic(), 0))
+        except TimeoutError:
+            for instance in added:
+                instance.stop()
+            raise
+        with self._lock:
+            removed = self.instances[instances:]
+            self.instances = self.instances[:instances] + added
+            self._cycle = itertools.cycle(self.instances)
+        for instance in removed:
+            instance.stop()
+        return added, removed
+
+    def _choose(self, strategy):
+        if strategy == "round_robin":
+            return next(self._cycle)
+        if strategy == "least_loaded":
+            return min(self.instances, key=lambda instance: instance.active)
+        raise ValueError(f"Unknown pool strategy: {strategy} (expected one of {', '.join(STRATEGIES)})")
+
+    def choose(self, strategy="round_robin"):
+        with self._lock:
+            return self._choose(strategy)
+
+    @contextmanager
+    def acquire(self, strategy="least_loaded"):
+        with self._lock:
+            instance = self._choose(strategy)
+            instance.active += 1
+        try:
+            yield instance
+        finally:
+            with self._lock:
+                instance.active -= 1
+
+    def rotate_all(self, timeout=CIRCUIT_TIMEOUT):
+        return {instance.index: instance.new_identity(timeout) for instance in self.instances}
+
+class CountryPool:
+    def __init__(self, countries, base_socks_port=BASE_SOCKS_PORT, base_control_port=BASE_CONTROL_PORT,
+                 data_root=POOL_DIR, idle_timeout=IDLE_TIMEOUT, memory_budget_mb=MEMORY_BUDGET_MB,
+                 bootstrap_timeout=BOOTSTRAP_TIMEOUT, tor_binary="tor"):
+        countries = [country.strip().upper() for country in countries if country.strip()]
+        if not countries:
+            raise ValueError("At least one country is required")
+        self.countries = list(dict.fromkeys(countries))
+        self.idle_timeout = idle_timeout
+        self.memory_budget_mb = memory_budget_mb
+        self.bootstrap_timeout = bootstrap_timeout
+        self.tor_binary = tor_binary
+        self.base_socks_port = base_socks_port
+        self.base_control_port = base_control_port
+        self.data_root = data_root
+        self.instances = {country: self._instance(i, country) for i, country in enumerate(self.countries)}
+        self._cycle = itertools.cycle(self.countries)
+        self._lock = threading.Lock()
+
+    def _instance(self, i, country):
+        return TorInstance(
+            i,
+            self.base_socks_port + i,
+            self.base_control_port + i,
+            os.path.join(self.data_root, f"country-{country.lower()}"),
+            country,
+        )
+
+    def __len__(self):
+        return len(self.running())
+
+    def __bool__(self):
+        return True
+
+    def __iter__(self):
+        return iter(self.running())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+    def running(self):
+        return [instance for instance in self.instances.values() if instance.is_running()]
+
+    def memory_mb(self):
+        return sum(instance.memory_mb() for instance in self.running())
+
+    def start(self):
+        if not shutil.which(self.tor_binary):
+            raise FileNotFoundError(f"Tor binary '{self.tor_binary}' not found in PATH")
+
+    def stop(self):
+        for instance in self.instances.values():
+            instance.stop()
+
+    def set_countries(self, countries):
+        countries = list(dict.fromkeys(country.strip().upper() for country in countries if country.strip()))
+        if not countries:
+            raise ValueError("At least one country is required")
+        with self._lock:
+            removed = [self.instances.pop(country) for country in self.countries if country not in countries]
+            used = {instance.index for instance in self.instances.values()}
+            free = (i for i in itertools.count() if i not in used)
+            added = [country for country in countries if country not in self.instances]
+            for country in added:
+                self.instances[country] = self._instance(next(free), country)
+            self.countries = countries
+            self._cycle = itertools.cycle(self.countries)
+        for instance in removed:
+            instance.stop()
+        return added, [instance.country for instance in removed]
+
+    def reap_idle(self):
+        now = time.monotonic()
+        with self._lock:
+            idle = [instance for instance in self.running()
+                    if not instance.active and now - instance.last_used > self.idle_timeout]
+            for instance in idle:
+                instance.stop()
+        return [instance.country for instance in idle]
+
+    def _make_room(self):
+        while self.memory_mb() + INSTANCE_MEMORY_MB > self.memory_budget_mb:
+            idle = [instance for instance in self.running() if not instance.active]
+            if not idle:
+                raise MemoryError(f"Memory budget of {self.memory_budget_mb} MB exhausted by busy Tor instances")
+            min(idle, key=lambda instance: instance.last_used).stop()
+
+    def _claim(self, country):
+        country = country.upper()
+        instance = self.instances.get(country)
+        if instance is None:
+            raise KeyError(f"Country {country} is not part of this pool")
+        self.reap_idle()
+        with instance.starting:
+            with self._lock:
+                if not instance.is_running():
+                    self._make_room()
+                    instance.start(self.tor_binary)
+                instance.active += 1
+            try:
+                if not instance.ready:
+                    instance.wait_until_ready(self.bootstrap_timeout)
+                    instance.ready = True
+            except BaseException:
+                self._release(instance)
+                with self._lock:
+                    if not instance.ready and not instance.active:
+                        instance.stop()
+                raise
+        return instance
+
+    def _release(self, instance):
+        with self._lock:
+            instance.active -= 1
+            instance.last_used = time.monotonic()
+
+    def _next_country(self, strategy):
+        if strategy == "round_robin":
+            with self._lock:
+                return next(self._cycle)
+        if strategy == "random":
+            return random.choice(self.countries)
+        raise ValueError(f"Unknown country strategy: {strategy} (expected round_robin or random)")
+
+    def get(self, country):
+        instance = self._claim(country)
+        self._release(instance)
+        return instance
+
+    def choose(self, strategy="round_robin"):
+        return self.get(self._next_country(strategy))
+
+    @contextmanager
+    def acquire(self, strategy="round_robin", country=None):
+        instance = self._claim(country or self._next_country(strategy))
+        try:
+            yield instance
+        finally:
+            self._release(instance)
+
+    def rotate_all(self, timeout=CIRCUIT_TIMEOUT):
+        return {instance.country: instance.new_identity(timeout) for instance in self.running()}
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import threading
+
+from .control import get_controller
+
+PID_FILE = os.path.expanduser("~/.tornet/tor.pid")
+LIVENESS_TTL = 2.0
+
+_cache = {"checked": 0.0, "pid": None}
+_lock = threading.Lock()
+
+def read_pid(pid_file=PID_FILE):
+    try:
+        with open(pid_file, "r") as f:
+            return int(f.read().strip())
+    except (OSError, ValueError):
+        return None
+
+def write_pid(pid, pid_file=PID_FILE):
+    os.makedirs(os.path.dirname(pid_file), exist_ok=True)
+    with open(pid_file, "w") as f:
+        f.write(f"{pid}\n")
+
+def remove_pid(pid_file=PID_FILE):
+    try:
+        os.remove(pid_file)
+    except OSError:
+        pass
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+def is_tor_process(pid):
+    if not pid_alive(pid):
+        return False
+    try:
+        with open(f"/proc/{pid}/comm", "r") as f:
+            return f.read().strip() == "tor"
+    except OSError:
+        return True
+
+def controller_pid():
+    controller = get_controller()
+    if controller is None:
+        return None
+    try:
+        return int(controller.get_pid(None) or 0) or None
+    except Exception:
+        return None
+
+def scan_proc():
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return None
+    for entry in entries:
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/comm", "r") as f:
+                    if f.read().strip() == "tor":
+                        return int(entry)
+            except OSError:
+                continue
+    return None
+
+def find_tor_pid():
+    pid = read_pid()
+    if pid and is_tor_process(pid):
+        return pid
+
+    pid = controller_pid() or scan_proc()
+    if pid:
+        try:
+            write_pid(pid)
+        except OSError:
+            pass
+    return pid
+
+def tor_pid(ttl=LIVENESS_TTL):
+    with _lock:
+        now = time.monotonic()
+        if now - _cache["checked"] < ttl:
+            return _cache["pid"]
+        pid = find_tor_pid()
+        _cache["checked"] = time.monotonic()
+        _cache["pid"] = pid
+        return pid
+
+def invalidate_liveness():
+    with _lock:
+        _cache["checked"] = 0.0
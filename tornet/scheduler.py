@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+import re
+import time
+import heapq
+import random
+import itertools
+import threading
+
+NEWNYM_RATE_LIMIT = 10.0
+UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+DURATION_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([smhd]?)\s*$", re.IGNORECASE)
+
+def parse_duration(value):
+    match = DURATION_RE.match(str(value))
+    if not match:
+        raise ValueError(f"Invalid duration: {value!r}")
+    number, unit = match.groups()
+    return float(number) * UNITS[(unit or "s").lower()]
+
+def interval_bounds(spec):
+    spec = str(spec)
+    if "-" in spec:
+        low, high = (parse_duration(part) for part in spec.split("-", 1))
+    else:
+        low = high = parse_duration(spec)
+    if low <= 0 or high < low:
+        raise ValueError(f"Invalid interval: {spec!r}")
+    return low, high
+
+class Job:
+    def __init__(self, name, interval, key=None, max_runs=None, rng=None):
+        self.name = name
+        self.interval = interval
+        self.low, self.high = interval_bounds(interval)
+        self.key = key
+        self.max_runs = max_runs
+        self.rng = rng or random
+        self.due = None
+        self.runs = 0
+        self.coalesced = 0
+        self.last_lateness = None
+        self.max_lateness = 0.0
+        self.total_lateness = 0.0
+
+    def next_delay(self):
+        if self.low == self.high:
+            return self.low
+        return self.rng.uniform(self.low, self.high)
+
+    def record(self, lateness, coalesced):
+        self.runs += 1
+        self.last_lateness = lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+        self.total_lateness += lateness
+        if coalesced:
+            self.coalesced += 1
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "key": self.key,
+            "runs": self.runs,
+            "coalesced": self.coalesced,
+            "last_lateness": self.last_lateness,
+            "max_lateness": self.max_lateness,
+            "avg_lateness": self.total_lateness / self.runs if self.runs else None,
+        }
+
+class RotationScheduler:
+    def __init__(self, rotate, on_fire=None, rate_limit=NEWNYM_RATE_LIMIT, clock=time.monotonic):
+        self.rotate = rotate
+        self.on_fire = on_fire
+        self.rate_limit = rate_limit
+        self.clock = clock
+        self.jobs = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._last_rotation = {}
+        self._stopped = threading.Event()
+        self._changed = threading.Event()
+        self._lock = threading.Lock()
+
+    def add(self, name, interval, key=None, max_runs=None, start=None):
+        job = Job(name, interval, key, max_runs)
+        with self._lock:
+            if name in self.jobs:
+                raise ValueError(f"Job {name!r} already scheduled")
+            job.due = (self.clock() if start is None else start) + job.next_delay()
+            self.jobs[name] = job
+            heapq.heappush(self._heap, (job.due, next(self._seq), job))
+        self._changed.set()
+        return job
+
+    def update(self, name, interval=None, max_runs=None):
+        with self._lock:
+            job = self.jobs.get(name)
+            if job is None:
+                raise KeyError(name)
+            if max_runs is not None:
+                job.max_runs = max_runs or None
+            if job.max_runs is not None and job.runs >= job.max_runs:
+                self.jobs.pop(name)
+            elif interval is not None and interval != job.interval:
+                replacement = Job(name, interval, job.key, job.max_runs, job.rng)
+                for attr in ("runs", "coalesced", "last_lateness", "max_lateness", "total_lateness"):
+                    setattr(replacement, attr, getattr(job, attr))
+                replacement.due = self.clock() + replacement.next_delay()
+                self.jobs[name] = job = replacement
+                heapq.heappush(self._heap, (job.due, next(self._seq), job))
+        self._changed.set()
+        return job
+
+    def remove(self, name):
+        with self._lock:
+            self.jobs.pop(name, None)
+        self._changed.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._changed.set()
+
+    def report(self):
+        with self._lock:
+            return [job.stats() for job in self.jobs.values()]
+
+    def _pop_due(self, now):
+        with self._lock:
+            while self._heap:
+                fire_at, _, job = self._heap[0]
+                if self.jobs.get(job.name) is not job:
+                    heapq.heappop(self._heap)
+                    continue
+                if fire_at > now:
+                    return None, fire_at
+                heapq.heappop(self._heap)
+                ready_at = self._last_rotation.get(job.key, float("-inf")) + self.rate_limit
+                if now < ready_at:
+                    heapq.heappush(self._heap, (ready_at, next(self._seq), job))
+                    continue
+                batch = [job]
+                deferred = []
+                while self._heap and self._heap[0][0] <= now:
+                    entry = heapq.heappop(self._heap)
+                    other = entry[2]
+                    if self.jobs.get(other.name) is not other:
+                        continue
+                    if other.key == job.key:
+                        batch.append(other)
+                    else:
+                        deferred.append(entry)
+                for entry in deferred:
+                    heapq.heappush(self._heap, entry)
+                return batch, None
+            return None, None
+
+    def _reschedule(self, job, now):
+        if job.max_runs is not None and job.runs >= job.max_runs:
+            return
+        due = job.due + job.next_delay()
+        if due <= now - job.high:
+            due = now + job.next_delay()
+        job.due = due
+        heapq.heappush(self._heap, (due, next(self._seq), job))
+
+    def run(self):
+        self._stopped.clear()
+        while not self._stopped.is_set():
+            self._changed.clear()
+            now = self.clock()
+            batch, wake_at = self._pop_due(now)
+            if batch is None:
+                if wake_at is None:
+                    return
+                timeout = None if wake_at is None else max(wake_at - self.clock(), 0)
+                self._changed.wait(timeout)
+                continue
+
+            key = batch[0].key
+            started = self.clock()
+            with self._lock:
+                self._last_rotation[key] = started
+            result = self.rotate(key)
+            with self._lock:
+                for i, job in enumerate(batch):
+                    job.record(started - job.due, coalesced=i > 0)
+                    self._reschedule(job, self.clock())
+            if self.on_fire is not None:
+                for job in batch:
+                    self.on_fire(job, result)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+
+import secrets
+import threading
+
+from .control import tor_proxies
+
+POOL_SIZE = 10
+
+_sessions = {}
+_lock = threading.Lock()
+_pool_size = POOL_SIZE
+
+def set_pool_size(size):
+    global _pool_size
+    if size < 1:
+        raise ValueError("Session pool size must be at least 1")
+    _pool_size = size
+    invalidate_sessions()
+
+def new_credentials(prefix="tornet"):
+    return f"{prefix}-{secrets.token_hex(4)}", secrets.token_hex(8)
+
+def new_session(socks_port=None, pool_size=None, username=None, password=None):
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    size = pool_size or _pool_size
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=size, pool_maxsize=size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    if socks_port is not None:
+        session.proxies.update(tor_proxies(socks_port, username=username, password=password))
+    return session
+
+def get_session(socks_port=None):
+    with _lock:
+        session = _sessions.get(socks_port)
+        if session is None:
+            session = new_session(socks_port)
+            _sessions[socks_port] = session
+        return session
+
+def invalidate_sessions(socks_port=None):
+    with _lock:
+        if socks_port is None:
+            stale = list(_sessions.values())
+            _sessions.clear()
+        else:
+            session = _sessions.pop(socks_port, None)
+            stale = [session] if session else []
+    for session in stale:
+        session.close()
+
+def close_sessions():
+    invalidate_sessions()
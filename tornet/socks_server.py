@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+
+import os
+import time
+import socket
+import struct
+import asyncio
+import itertools
+
+from .control import SOCKS_HOST, SOCKS_PORT
+from .metrics import RELAYED_BYTES, PROXY_CONNECTIONS
+
+BUFFER_SIZE = 256 * 1024
+CONNECT_TIMEOUT = 30
+HANDSHAKE_TIMEOUT = 30
+LISTEN_BACKLOG = 4096
+POLICIES = ("connection", "requests", "time")
+
+SOCKS_VERSION = 5
+AUTH_NONE = 0x00
+AUTH_PASSWORD = 0x02
+AUTH_UNACCEPTABLE = 0xFF
+CMD_CONNECT = 0x01
+ATYP_IPV4 = 0x01
+ATYP_DOMAIN = 0x03
+ATYP_IPV6 = 0x04
+REPLY_SUCCEEDED = 0x00
+REPLY_FAILURE = 0x01
+REPLY_COMMAND_NOT_SUPPORTED = 0x07
+REPLY_ADDRESS_NOT_SUPPORTED = 0x08
+
+class SocksError(Exception):
+    def __init__(self, message, reply=REPLY_FAILURE):
+        super().__init__(message)
+        self.reply = reply
+
+class RotationPolicy:
+    def __init__(self, policy="connection", every=1):
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown rotation policy: {policy} (expected one of {', '.join(POLICIES)})")
+        if every <= 0:
+            raise ValueError("Rotation interval must be positive")
+        self.policy = policy
+        self.every = every
+        self._connections = itertools.count()
+
+    def epoch(self):
+        if self.policy == "time":
+            return int(time.monotonic() // self.every)
+        count = next(self._connections)
+        if self.policy == "requests":
+            return count // int(self.every)
+        return count
+
+class Connection:
+    def __init__(self, cid, client, epoch, upstream):
+        self.id = cid
+        self.client = client
+        self.epoch = epoch
+        self.upstream = upstream
+        self.target = None
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self.started = time.monotonic()
+
+class RotatingSocksServer:
+    def __init__(self, upstreams=None, host=SOCKS_HOST, port=1080, policy=None, buffer_size=BUFFER_SIZE):
+        self.upstreams = list(upstreams or [(SOCKS_HOST, SOCKS_PORT)])
+        self.host = host
+        self.port = port
+        self.policy = policy or RotationPolicy()
+        self.buffer_size = buffer_size
+        self.use_splice = hasattr(os, "splice")
+        self.connections = {}
+        self.total_connections = 0
+        self.failed_connections = 0
+        self.bytes_up = 0
+        self.bytes_down = 0
+        self._ids = itertools.count(1)
+        self._sock = None
+
+    def stats(self):
+        return {
+            "active_connections": len(self.connections),
+            "total_connections": self.total_connections,
+            "failed_connections": self.failed_connections,
+            "bytes_up": self.bytes_up + sum(c.bytes_up for c in self.connections.values()),
+            "bytes_down": self.bytes_down + sum(c.bytes_down for c in self.connections.values()),
+        }
+
+    async def serve_forever(self):
+        loop = asyncio.get_running_loop()
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind((self.host, self.port))
+        self._sock.listen(LISTEN_BACKLOG)
+        self._sock.setblocking(False)
+        self.port = self._sock.getsockname()[1]
+        tasks = set()
+        try:
+            while True:
+                client, address = await loop.sock_accept(self._sock)
+                task = loop.create_task(self.handle(client, address))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        finally:
+            self._sock.close()
+            for task in tasks:
+                task.cancel()
+
+    async def handle(self, client, address):
+        loop = asyncio.get_running_loop()
+        client.setblocking(False)
+        client.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        epoch = self.policy.epoch()
+        upstream_address = self.upstreams[epoch % len(self.upstreams)]
+        conn = Connection(next(self._ids), address, epoch, upstream_address)
+        self.connections[conn.id] = conn
+        self.total_connections += 1
+        upstream = None
+        outcome = "failed"
+        try:
+            request = await asyncio.wait_for(self.client_handshake(loop, client), HANDSHAKE_TIMEOUT)
+            conn.target = request
+            try:
+                upstream, reply = await asyncio.wait_for(
+                    self.upstream_connect(loop, upstream_address, request, epoch), CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError) as e:
+                raise SocksError(f"Upstream {upstream_address[0]}:{upstream_address[1]} unreachable: {e}")
+            await loop.sock_sendall(client, reply)
+            if reply[1] != REPLY_SUCCEEDED:
+                outcome = "refused"
+                return
+            outcome = "relayed"
+            await asyncio.gather(
+                self.relay(loop, client, upstream, conn, "bytes_up"),
+                self.relay(loop, upstream, client, conn, "bytes_down"),
+            )
+        except SocksError as e:
+            self.failed_connections += 1
+            try:
+                await loop.sock_sendall(client, socks_reply(e.reply))
+            except OSError:
+                pass
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+            self.failed_connections += 1
+        finally:
+            client.close()
+            if upstream is not None:
+                upstream.close()
+            del self.connections[conn.id]
+            self.bytes_up += conn.bytes_up
+            self.bytes_down += conn.bytes_down
+            RELAYED_BYTES.inc(conn.bytes_up, direction="up")
+            RELAYED_BYTES.inc(conn.bytes_down, direction="down")
+            PROXY_CONNECTIONS.inc(outcome=outcome)
+
+    async def client_handshake(self, loop, client):
+        version, nmethods = await recv_exact(loop, client, 2)
+        if version != SOCKS_VERSION:
+            raise SocksError(f"Unsupported SOCKS version {version}")
+        methods = await recv_exact(loop, client, nmethods)
+        if AUTH_NONE not in methods:
+            await loop.sock_sendall(client, bytes([SOCKS_VERSION, AUTH_UNACCEPTABLE]))
+            raise OSError("Client offered no acceptable authentication method")
+        await loop.sock_sendall(client, bytes([SOCKS_VERSION, AUTH_NONE]))
+
+        version, cmd, _, atyp = await recv_exact(loop, client, 4)
+        if cmd != CMD_CONNECT:
+            raise SocksError(f"Unsupported SOCKS command {cmd}", REPLY_COMMAND_NOT_SUPPORTED)
+        if atyp == ATYP_IPV4:
+            address = await recv_exact(loop, client, 4)
+        elif atyp == ATYP_IPV6:
+            address = await recv_exact(loop, client, 16)
+        elif atyp == ATYP_DOMAIN:
+            length = await recv_exact(loop, client, 1)
+            address = length + await recv_exact(loop, client, length[0])
+        else:
+            raise SocksError(f"Unsupported address type {atyp}", REPLY_ADDRESS_NOT_SUPPORTED)
+        port = await recv_exact(loop, client, 2)
+        return bytes([atyp]) + address + port
+
+    async def upstream_connect(self, loop, upstream_address, request, epoch):
+        upstream = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        upstream.setblocking(False)
+        try:
+            await loop.sock_connect(upstream, upstream_address)
+            upstream.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            await loop.sock_sendall(upstream, bytes([SOCKS_VERSION, 1, AUTH_PASSWORD]))
+            version, method = await recv_exact(loop, upstream, 2)
+            if method == AUTH_PASSWORD:
+                username = b"tornet"
+                password = str(epoch).encode()
+                await loop.sock_sendall(
+                    upstream, bytes([1, len(username)]) + username + bytes([len(password)]) + password)
+                _, status = await recv_exact(loop, upstream, 2)
+                if status != 0:
+                    raise OSError("Upstream rejected isolation credentials")
+            elif method != AUTH_NONE:
+                raise OSError("Upstream requires an unsupported authentication method")
+
+            await loop.sock_sendall(upstream, bytes([SOCKS_VERSION, CMD_CONNECT, 0]) + request)
+            header = await recv_exact(loop, upstream, 4)
+            atyp = header[3]
+            if atyp == ATYP_IPV4:
+                bound = await recv_exact(loop, upstream, 4 + 2)
+            elif atyp == ATYP_IPV6:
+                bound = await recv_exact(loop, upstream, 16 + 2)
+            elif atyp == ATYP_DOMAIN:
+                length = await recv_exact(loop, upstream, 1)
+                bound = length + await recv_exact(loop, upstream, length[0] + 2)
+            else:
+                raise OSError(f"Upstream replied with unknown address type {atyp}")
+            return upstream, header + bound
+        except BaseException:
+            upstream.close()
+            raise
+
+    async def relay(self, loop, src, dst, conn, counter):
+        try:
+            if self.use_splice:
+                await self.splice_relay(loop, src, dst, conn, counter)
+            else:
+                await self.copy_relay(loop, src, dst, conn, counter)
+        except OSError:
+            pass
+        finally:
+            try:
+                dst.shutdown(socket.SHUT_WR)
+            except OSError:
+                pass
+
+    async def copy_relay(self, loop, src, dst, conn, counter):
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        while True:
+            n = await loop.sock_recv_into(src, buffer)
+            if not n:
+                return
+            await loop.sock_sendall(dst, view[:n])
+            setattr(conn, counter, getattr(conn, counter) + n)
+
+    async def splice_relay(self, loop, src, dst, conn, counter):
+        flags = os.SPLICE_F_MOVE | os.SPLICE_F_NONBLOCK
+        read_pipe, write_pipe = os.pipe()
+        try:
+            while True:
+                await wait_fd(loop, src, readable=True)
+                try:
+                    n = os.splice(src.fileno(), write_pipe, self.buffer_size, flags=flags)
+                except BlockingIOError:
+                    continue
+                if not n:
+                    return
+                pending = n
+                while pending:
+                    try:
+                        pending -= os.splice(read_pipe, dst.fileno(), pending, flags=flags)
+                    except BlockingIOError:
+                        await wait_fd(loop, dst, readable=False)
+                setattr(conn, counter, getattr(conn, counter) + n)
+        finally:
+            os.close(read_pipe)
+            os.close(write_pipe)
+
+def socks_reply(reply):
+    return bytes([SOCKS_VERSION, reply, 0, ATYP_IPV4]) + socket.inet_aton("0.0.0.0") + struct.pack("!H", 0)
+
+async def recv_exact(loop, sock, n):
+    data = bytearray()
+    while len(data) < n:
+        chunk = await loop.sock_recv(sock, n - len(data))
+        if not chunk:
+            raise asyncio.IncompleteReadError(bytes(data), n)
+        data += chunk
+    return bytes(data)
+
+async def wait_fd(loop, sock, readable=True):
+    future = loop.create_future()
+    fd = sock.fileno()
+
+    def ready():
+        if not future.done():
+            future.set_result(None)
+
+    if readable:
+        loop.add_reader(fd, ready)
+    else:
+        loop.add_writer(fd, ready)
+    try:
+        await future
+    finally:
+        if readable:
+            loop.remove_reader(fd)
+        else:
+            loop.remove_writer(fd)
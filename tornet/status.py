@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+
+import time
+import threading
+
+PROBE_TIMEOUT = 10.0
+
+class StatusProbe:
+    def __init__(self, name, func, timeout=PROBE_TIMEOUT, ttl=0.0):
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.ttl = ttl
+        self.value = None
+        self.error = None
+        self.seconds = None
+        self.updated = None
+        self.started = None
+        self.thread = None
+
+    def fresh(self, now):
+        return self.updated is not None and (self.ttl is None or now - self.updated < self.ttl)
+
+    def finished(self):
+        return self.updated is not None and self.started is not None and self.updated >= self.started
+
+    def running(self):
+        return self.thread is not None and self.thread.is_alive()
+
+    def deadline(self):
+        return self.started + self.timeout
+
+    def report(self, now):
+        return {
+            "seconds": round(self.seconds, 4) if self.seconds is not None else None,
+            "age": round(now - self.updated, 3) if self.updated is not None else None,
+            "error": self.error,
+            "pending": self.running() and not self.finished(),
+        }
+
+class StatusCollector:
+    def __init__(self, probes, static=None):
+        self.probes = {probe.name: probe for probe in probes}
+        self.static = dict(static or {})
+        self._cond = threading.Condition()
+
+    def _run(self, probe):
+        start = time.monotonic()
+        try:
+            value, error = probe.func(), None
+        except Exception as e:
+            value, error = None, str(e) or type(e).__name__
+        with self._cond:
+            if error is None:
+                probe.value = value
+            probe.error = error
+            probe.seconds = time.monotonic() - start
+            probe.updated = time.monotonic()
+            self._cond.notify_all()
+
+    def refresh(self):
+        now = time.monotonic()
+        started = []
+        with self._cond:
+            for probe in self.probes.values():
+                if probe.fresh(now) or probe.running():
+                    continue
+                probe.started = now
+                probe.thread = threading.Thread(target=self._run, args=(probe,),
+                                                name=f"tornet-status-{probe.name}", daemon=True)
+                probe.thread.start()
+                started.append(probe)
+        return started
+
+    def collect(self, on_result=None):
+        self.refresh()
+        with self._cond:
+            pending = [probe for probe in self.probes.values() if probe.running()]
+            for probe in self.probes.values():
+                if probe not in pending and on_result is not None:
+                    on_result(probe.name, self._snapshot())
+            while pending:
+                now = time.monotonic()
+                done = [probe for probe in pending if probe.finished() or probe.deadline() <= now]
+                for probe in done:
+                    pending.remove(probe)
+                    if not probe.finished():
+                        probe.error = f"timed out after {probe.timeout:g}s"
+                    if on_result is not None:
+                        on_result(probe.name, self._snapshot())
+                if pending:
+                    self._cond.wait(min(probe.deadline() for probe in pending) - now)
+            return self._snapshot()
+
+    def snapshot(self):
+        with self._cond:
+            return self._snapshot()
+
+    def _snapshot(self):
+        now = time.monotonic()
+        status = dict(self.static)
+        for probe in self.probes.values():
+            if probe.value is not None:
+                status.update(probe.value)
+        status["probes"] = {name: probe.report(now) for name, probe in self.probes.items()}
+        return status
@@ -4,22 +4,33 @@ import os
 import sys
 import time
 import argparse
-import requests
 import subprocess
 import signal
 import shutil
-import random
 import json
-import yaml
 import threading
-import socket
-import select
-import re
-import tempfile
-import shlex
-from datetime import datetime, timedelta
-from pathlib import Path
+from collections import deque
+from contextlib import ExitStack, nullcontext
+from datetime import datetime
 from .banner import print_banner
+from .control import (
+    get_controller, new_identity, wait_for_bootstrap, wait_for_port_closed, set_exit_country, exit_ip,
+    exit_fingerprint, SOCKS_PORT, CONTROL_PORT, DNS_PORT, CIRCUIT_TIMEOUT, BOOTSTRAP_TIMEOUT
+)
+from .pool import TorPool, CountryPool, BASE_SOCKS_PORT, BASE_CONTROL_PORT
+from .sessions import get_session, invalidate_sessions, set_pool_size, close_sessions
+from .ipcheck import fetch_ip, set_backends, backend_stats, ranked_backends
+from .circuits import CircuitPool
+from .process import tor_pid, invalidate_liveness, remove_pid, PID_FILE
+from .geoip import get_index, lookup_country
+from .history import ExitHistory, HISTORY_FILE, HISTORY_WINDOW, UNIQUE_RETRIES
+from .scheduler import RotationScheduler, interval_bounds, NEWNYM_RATE_LIMIT
+from .daemon import DaemonServer, DaemonError, daemon_request, SOCKET_FILE
+from .metrics import REGISTRY, ROTATION_SECONDS, ROTATIONS, ROTATION_FAILURES, serve_metrics
+from .eventlog import EventLog, read_range, follow as follow_file
+from .status import StatusCollector, StatusProbe
+from .exits import ExitScores, ExitMonitor, probe_exit, EXIT_SCORES_FILE, MAX_TTFB, MIN_THROUGHPUT
+from .config import ConfigWatcher, ConfigError, FIELDS_BY_NAME, parse_settings, read_config
 
 TOOL_NAME = "tornet"
 VERSION = "2.0.2"
@@ -27,6 +38,28 @@ CONFIG_FILE = os.path.expanduser("~/.tornet/config.yml")
 LOG_FILE = os.path.expanduser("~/.tornet/tornet.log")
 TORRC_FILE = os.path.expanduser("~/.tornet/torrc.custom")
 CURRENT_COUNTRY_FILE = os.path.expanduser("~/.tornet/current_country")
+TOR_LOG_FILE = os.path.expanduser("~/.tornet/tor-notice.log")
+
+_pool = None
+_circuit_pool = None
+_exit_country = None
+_persist_country = False
+_bootstrap_timeout = BOOTSTRAP_TIMEOUT
+_verify_ip = False
+_ip_source = None
+_verifications = deque(maxlen=100)
+_history = None
+_unique_retries = UNIQUE_RETRIES
+_rotate_lock = threading.Lock()
+_events = None
+_status = None
+_dns_port = DNS_PORT
+_pool_ports = (BASE_SOCKS_PORT, BASE_CONTROL_PORT)
+_exit_scores = None
+_exit_monitor = None
+_exit_probe_url = None
+_json_output = False
+_readiness_warned = False
 
 green = "\033[92m"
 red = "\033[91m"
@@ -36,19 +69,32 @@ cyan = "\033[36m"
 yellow = "\033[93m"
 blue = "\033[94m"
 
+def record_event(event, **fields):
+    global _events
+    if _events is None:
+        _events = EventLog(LOG_FILE)
+    _events.emit(event, **fields)
+
+def rotation_failed(cause, **fields):
+    ROTATION_FAILURES.inc(cause=cause)
+    record_event("rotation_failure", cause=cause, **fields)
+
+def message_stream():
+    return sys.stderr if _json_output else sys.stdout
+
 def log(msg: str):
-    print(f"{white} [{green}+{white}]{green} {msg}{reset}")
+    print(f"{white} [{green}+{white}]{green} {msg}{reset}", file=message_stream())
 
 def error(msg: str, exit_code: int = 1):
-    print(f"{white} [{red}!{white}] {red}{msg}{reset}")
+    print(f"{white} [{red}!{white}] {red}{msg}{reset}", file=message_stream())
     if exit_code > 0:
         sys.exit(exit_code)
 
 def warning(msg: str):
-    print(f"{white} [{red}!{white}] {red}{msg}{reset}")
+    print(f"{white} [{red}!{white}] {red}{msg}{reset}", file=message_stream())
 
 def info(msg: str):
-    print(f"{white} [{blue}*{white}]{blue} {msg}{reset}")
+    print(f"{white} [{blue}*{white}]{blue} {msg}{reset}", file=message_stream())
 
 def is_root():
     return os.geteuid() == 0
@@ -94,6 +140,7 @@ def service_action(action):
         error("No supported service manager found (systemctl or service)", 3)
     
     result = run_cmd(cmd, use_sudo=True, check=False)
+    invalidate_liveness()
     if result.returncode != 0:
         warning(f"Failed to {action} tor service: {result.stderr.strip()}")
 
@@ -188,120 +235,252 @@ def ensure_tor():
         error("Please install Tor manually then try this command again.", 7)
 
 def is_tor_running():
-    if shutil.which("pgrep"):
-        try:
-            subprocess.run(["pgrep", "-x", "tor"], check=True, capture_output=True)
-            return True
-        except subprocess.CalledProcessError:
-            return False
-    
-    try:
-        for pid in os.listdir("/proc"):
-            if pid.isdigit():
-                try:
-                    with open(f"/proc/{pid}/comm", "r") as f:
-                        if f.read().strip() == "tor":
-                            return True
-                except:
-                    continue
-    except:
-        pass
-    
-    return False
+    return tor_pid() is not None
 
-def get_current_ip():
+def get_current_ip(instance=None):
+    if instance is not None:
+        return get_ip_via_tor(instance.socks_port)
     if is_tor_running():
         return get_ip_via_tor()
     else:
         return get_ip_direct()
 
-def get_ip_via_tor():
-    url = 'https://api.ipify.org'
-    proxies = {
-        'http': 'socks5://127.0.0.1:9050',
-        'https': 'socks5://127.0.0.1:9050'
-    }
-    try:
-        response = requests.get(url, proxies=proxies, timeout=10)
-        response.raise_for_status()
-        return response.text.strip()
-    except requests.RequestException:
+def get_ip_via_tor(socks_port=SOCKS_PORT, quiet=False):
+    ip = fetch_ip(socks_port)
+    if ip is None and not quiet:
         warning("Having trouble connecting to the Tor network. Please wait a moment.")
-        return None
+    return ip
 
 def get_ip_direct():
-    try:
-        response = requests.get('https://api.ipify.org', timeout=10)
-        response.raise_for_status()
-        return response.text.strip()
-    except requests.RequestException:
+    ip = fetch_ip()
+    if ip is None:
         warning("Having trouble fetching IP address. Please check your internet connection.")
-        return None
+    return ip
+
+def get_ip_with_country(socks_port=SOCKS_PORT, quiet=False):
+    if get_index() is not None:
+        ip = get_ip_via_tor(socks_port, quiet)
+        country_code = lookup_country(ip) if ip else None
+        return ip, country_code, get_country_name(country_code) if country_code else None
 
-def get_ip_with_country():
     url = 'https://ipapi.co/json/'
-    proxies = {
-        'http': 'socks5://127.0.0.1:9050',
-        'https': 'socks5://127.0.0.1:9050'
-    }
     try:
-        response = requests.get(url, proxies=proxies, timeout=10)
+        response = get_session(socks_port).get(url, timeout=10)
         response.raise_for_status()
         data = response.json()
         return data.get('ip'), data.get('country_code'), data.get('country_name')
     except:
         try:
-            ip = get_ip_via_tor()
+            ip = get_ip_via_tor(socks_port, quiet)
             return ip, None, None
         except:
             return None, None, None
 
-def change_ip(country=None):
-    if country and country != "auto":
-        configure_tor_country(country)
+def verify_exit_ip(expected, socks_port):
+    actual = fetch_ip(socks_port)
+    result = {"expected": expected, "actual": actual, "match": actual == expected}
+    _verifications.append(result)
+    if actual and actual != expected:
+        warning(f"Exit relay address {expected} differs from observed exit IP {actual}.")
+    return result
+
+def start_ip_verification(expected, socks_port):
+    thread = threading.Thread(target=verify_exit_ip, args=(expected, socks_port), name="tornet-verify", daemon=True)
+    thread.start()
+    return thread
+
+def lookup_new_ip(controller, circuit_id, socks_port=SOCKS_PORT, instance=None):
+    global _ip_source
+    if controller and circuit_id:
+        ip = exit_ip(controller, circuit_id)
+        if ip:
+            _ip_source = "tor"
+            if _verify_ip:
+                start_ip_verification(ip, socks_port)
+            return ip
+    _ip_source = "echo"
+    return get_current_ip(instance)
+
+def score_exit(controller, circuit_id, ip, socks_port):
+    fingerprint = exit_fingerprint(controller, circuit_id)
+    if fingerprint is None:
+        return None
+    echo_url = ranked_backends()[0].url
+    return probe_exit(_exit_scores, get_session(socks_port), fingerprint, echo_url, ip, _exit_probe_url)
+
+def start_exit_probe(controller, circuit_id, ip, socks_port):
+    thread = threading.Thread(target=score_exit, args=(controller, circuit_id, ip, socks_port),
+                              name="tornet-exit-probe", daemon=True)
+    thread.start()
+    return thread
+
+def finish_rotation(started, circuit_started, controller, circuit_id, socks_port=SOCKS_PORT, instance=None):
+    built = time.monotonic()
+    ROTATION_SECONDS.observe(built - circuit_started, phase="circuit")
+    ip = lookup_new_ip(controller, circuit_id, socks_port, instance)
+    done = time.monotonic()
+    ROTATION_SECONDS.observe(done - built, phase="lookup")
+    ROTATION_SECONDS.observe(done - started, phase="total")
+    if ip:
+        ROTATIONS.inc(source=_ip_source)
+        record_event("rotation", ip=ip, source=_ip_source, circuit=circuit_id,
+                     instance=instance.index if instance is not None else None,
+                     seconds=round(done - started, 4))
+        if _exit_scores is not None and controller and circuit_id:
+            start_exit_probe(controller, circuit_id, ip, socks_port)
+    else:
+        rotation_failed("ip_lookup", circuit=circuit_id)
+    return ip
+
+def change_ip(country=None, instance=None):
+    started = time.monotonic()
+    if instance is not None:
+        circuit_id = instance.new_identity(CIRCUIT_TIMEOUT)
+        if not circuit_id:
+            rotation_failed("circuit_timeout", instance=instance.index)
+            warning(f"Timed out waiting for a new circuit on Tor instance {instance.index}.")
+        invalidate_sessions(instance.socks_port)
+        return finish_rotation(started, started, instance.controller(), circuit_id, instance.socks_port, instance)
+
+    if country and country != "auto" and country.upper() != _exit_country:
+        configure_tor_country(country, _persist_country)
+        ROTATION_SECONDS.observe(time.monotonic() - started, phase="country")
     
-    service_action("reload")
-    time.sleep(2)
-    return get_current_ip()
+    circuit_started = time.monotonic()
+    controller = get_controller()
+    circuit_id = _circuit_pool.rotate() if _circuit_pool is not None else None
+    if circuit_id is None:
+        if _circuit_pool is not None:
+            rotation_failed("circuit_pool_empty")
+        if controller:
+            circuit_id = new_identity(controller, CIRCUIT_TIMEOUT)
+            if not circuit_id:
+                rotation_failed("circuit_timeout")
+                warning("Timed out waiting for a new Tor circuit.")
+        else:
+            rotation_failed("no_controller")
+            service_action("reload")
+            wait_for_tor()
+    invalidate_sessions(SOCKS_PORT)
+    return finish_rotation(started, circuit_started, controller, circuit_id)
+
+def change_ip_unique(country=None, instance=None):
+    new_ip = change_ip(country, instance)
+    if _history is None:
+        return new_ip
+    attempts = 0
+    while new_ip and new_ip in _history and attempts < _unique_retries:
+        _history.record_reuse()
+        attempts += 1
+        info(f"Exit {new_ip} was used recently, rotating again ({attempts}/{_unique_retries})")
+        new_ip = change_ip(country, instance)
+    if new_ip and new_ip in _history:
+        rotation_failed("exit_reused", ip=new_ip)
+    if new_ip:
+        _history.add(new_ip)
+        try:
+            _history.save()
+        except OSError as e:
+            warning(f"Could not save exit history: {e}")
+    return new_ip
 
-def configure_tor_country(country_code):
+def wait_for_tor(log_file=None):
+    global _readiness_warned
+    try:
+        source = wait_for_bootstrap(CONTROL_PORT, SOCKS_PORT, _bootstrap_timeout, log_file)
+    except TimeoutError as e:
+        record_event("bootstrap_timeout", timeout=_bootstrap_timeout)
+        error(str(e), 18)
+    if source == "port" and not _readiness_warned:
+        _readiness_warned = True
+        warning("No Tor ControlPort or readable notice log; readiness is only approximated by the SocksPort "
+                "accepting connections and Tor may still be bootstrapping.")
+
+def record_current_country(country_code):
+    os.makedirs(os.path.dirname(CURRENT_COUNTRY_FILE), exist_ok=True)
+    with open(CURRENT_COUNTRY_FILE, "w") as f:
+        f.write(country_code)
+
+def write_country_torrc(country_code):
     os.makedirs(os.path.dirname(TORRC_FILE), exist_ok=True)
-    
+    with open(TORRC_FILE, "w") as f:
+        f.write(f"ExitNodes {{{country_code}}}\n")
+        f.write("StrictNodes 1\n")
+        f.write(f"ControlPort {CONTROL_PORT}\n")
+        f.write(f"DNSPort 127.0.0.1:{_dns_port}\n")
+        f.write("CookieAuthentication 1\n")
+        f.write(f"Log notice file {TOR_LOG_FILE}\n")
+        f.write(f"PidFile {PID_FILE}\n")
+
+def configure_tor_country(country_code, persist=False):
+    global _exit_country
+    country_code = country_code.upper()
+
+    controller = get_controller()
+    if controller:
+        try:
+            set_exit_country(controller, country_code)
+            record_current_country(country_code)
+            if persist:
+                write_country_torrc(country_code)
+        except Exception as e:
+            warning(f"Could not apply exit country via control port: {e}")
+        else:
+            _exit_country = country_code
+            if _circuit_pool is not None:
+                _circuit_pool.flush()
+            record_event("country_switch", country=country_code, method="controller")
+            log(f"Configured Tor to use exit nodes from {country_code}")
+            return
+
     try:
-        with open(TORRC_FILE, "w") as f:
-            f.write(f"ExitNodes {{{country_code.upper()}}}\n")
-            f.write("StrictNodes 1\n")
-        
-        with open(CURRENT_COUNTRY_FILE, "w") as f:
-            f.write(country_code.upper())
+        write_country_torrc(country_code)
+        record_current_country(country_code)
         
-        log(f"Configured Tor to use exit nodes from {country_code.upper()}")
+        log(f"Configured Tor to use exit nodes from {country_code}")
         
         service_action("stop")
-        time.sleep(1)
+        wait_for_port_closed(SOCKS_PORT)
+        if os.path.exists(TOR_LOG_FILE):
+            os.remove(TOR_LOG_FILE)
         
         tor_cmd = ["tor", "-f", TORRC_FILE, "--RunAsDaemon", "1"]
         result = run_cmd(tor_cmd, use_sudo=False, check=False)
+        invalidate_liveness()
         
         if result.returncode != 0:
             log("Starting Tor with custom configuration...")
-            time.sleep(3)
+        wait_for_tor(TOR_LOG_FILE)
+        _exit_country = country_code
+        record_event("country_switch", country=country_code, method="restart")
         
     except Exception as e:
+        record_event("country_switch_failure", country=country_code, error=str(e))
         warning(f"Could not configure Tor country: {e}")
 
 def restore_default_tor():
+    global _exit_country
     try:
-        if os.path.exists(TORRC_FILE):
+        restart = os.path.exists(TORRC_FILE)
+        if restart:
             os.remove(TORRC_FILE)
         if os.path.exists(CURRENT_COUNTRY_FILE):
             os.remove(CURRENT_COUNTRY_FILE)
+        _exit_country = None
+
+        controller = get_controller()
+        if controller and not restart:
+            set_exit_country(controller, None)
+            record_event("country_reset", method="controller")
+            log("Restored default Tor configuration")
+            return
         
         service_action("stop")
-        time.sleep(1)
+        wait_for_port_closed(SOCKS_PORT)
         service_action("start")
-        time.sleep(2)
+        wait_for_tor()
         
+        record_event("country_reset", method="restart")
         log("Restored default Tor configuration")
     except Exception as e:
         warning(f"Could not restore default Tor configuration: {e}")
@@ -315,46 +494,72 @@ def get_current_country():
             pass
     return "Auto (Random)"
 
-def print_ip(ip):
-    log(f"Your IP address is: {white}{ip}")
-
-def change_ip_repeatedly(interval_str, count, country=None, json_output=False):
-    if count == 0:
-        while True:
-            try:
-                sleep_time = parse_interval(interval_str)
-                time.sleep(sleep_time)
-                new_ip = change_ip(country)
-                if new_ip:
-                    if json_output:
-                        print(json.dumps({"timestamp": time.time(), "ip": new_ip}))
-                    else:
-                        print_ip(new_ip)
-            except KeyboardInterrupt:
-                break
+def print_ip(ip, country_code=None):
+    if country_code:
+        log(f"Your IP address is: {white}{ip} ({get_country_name(country_code)})")
     else:
-        for i in range(count):
-            try:
-                sleep_time = parse_interval(interval_str)
-                time.sleep(sleep_time)
-                new_ip = change_ip(country)
-                if new_ip:
-                    if json_output:
-                        print(json.dumps({"timestamp": time.time(), "ip": new_ip, "count": i+1}))
-                    else:
-                        print_ip(new_ip)
-            except KeyboardInterrupt:
-                break
-
-def parse_interval(interval_str):
-    try:
-        if "-" in str(interval_str):
-            start, end = map(int, str(interval_str).split("-", 1))
-            return random.randint(start, end)
-        else:
-            return int(interval_str)
+        log(f"Your IP address is: {white}{ip}")
+
+def change_ip_repeatedly(interval_str, count, country=None, json_output=False, pool=None, watcher=None):
+    try:
+        interval_bounds(interval_str)
     except ValueError:
         error("Invalid interval format. Use number or range (e.g., '60' or '30-120')", 8)
+    current = {"country": country}
+
+    def rotate(key):
+        with ExitStack() as stack:
+            try:
+                instance = stack.enter_context(use_instance(pool))
+            except (TimeoutError, MemoryError) as e:
+                rotation_failed("no_instance")
+                warning(f"Could not get a Tor instance: {e}")
+                return None, None
+            return instance, change_ip_unique(current["country"], instance)
+
+    def on_fire(job, result):
+        instance, new_ip = result
+        if not new_ip:
+            return
+        if json_output:
+            output = {"timestamp": time.time(), "ip": new_ip, "source": _ip_source, "late": round(job.last_lateness, 3)}
+            if count:
+                output["count"] = job.runs
+            if instance is not None:
+                output["instance"] = instance.index
+                if instance.country:
+                    output["country"] = instance.country
+            if _circuit_pool is not None:
+                output["rotate_to_first_byte"] = _circuit_pool.last_rotate_to_first_byte
+            output["country_code"] = lookup_country(new_ip)
+            print(json.dumps(output))
+        else:
+            print_ip(new_ip, lookup_country(new_ip))
+
+    def on_reload(old, new, changed):
+        if "country" in changed:
+            current["country"] = new.country
+            if new.country is None and pool is None:
+                restore_default_tor()
+        if "interval" in changed or "count" in changed:
+            try:
+                scheduler.update("rotation", new.interval if "interval" in changed else None,
+                                 new.count if "count" in changed else None)
+            except KeyError:
+                pass
+
+    rate_limit = 0 if pool is not None or _circuit_pool is not None else NEWNYM_RATE_LIMIT
+    scheduler = RotationScheduler(rotate, on_fire, rate_limit)
+    scheduler.add("rotation", interval_str, max_runs=count or None)
+    if watcher is not None:
+        watcher.subscribe(on_reload)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.unsubscribe(on_reload)
 
 def auto_fix():
     log("Running auto-fix...")
@@ -365,6 +570,8 @@ def auto_fix():
 
 def stop_services():
     restore_default_tor()
+    record_event("stop")
+    _events.flush()
     try:
         subprocess.run(["pkill", "-f", "tor"], check=False, capture_output=True)
     except:
@@ -373,64 +580,356 @@ def stop_services():
         subprocess.run(["pkill", "-f", TOOL_NAME], check=False, capture_output=True)
     except:
         pass
+    remove_pid()
+    invalidate_liveness()
     log(f"Tor services and {TOOL_NAME} processes stopped.")
 
+def start_circuit_pool(size):
+    global _circuit_pool
+    controller = get_controller()
+    if controller is None:
+        warning("Circuit pool requires the Tor control port; falling back to NEWNYM rotation.")
+        return None
+    _circuit_pool = CircuitPool(controller, size, scores=_exit_scores)
+    _circuit_pool.start()
+    if not _circuit_pool.wait_until_ready(CIRCUIT_TIMEOUT):
+        warning("No pre-built circuit ready yet; rotations will fall back to NEWNYM until the pool fills.")
+    return _circuit_pool
+
+def start_exit_scoring(max_ttfb=MAX_TTFB, min_throughput=MIN_THROUGHPUT, probe_url=None):
+    global _exit_scores, _exit_monitor, _exit_probe_url
+    _exit_scores = ExitScores(EXIT_SCORES_FILE, max_ttfb, min_throughput)
+    _exit_probe_url = probe_url
+    controller = get_controller()
+    if controller is None:
+        warning("Exit scoring requires the Tor control port; slow exits will not be avoided.")
+        return _exit_scores
+    _exit_monitor = ExitMonitor(controller, _exit_scores,
+                                on_close=lambda closed: record_event("slow_exits_closed",
+                                                                     exits=[fp for _, fp in closed]))
+    _exit_monitor.start()
+    return _exit_scores
+
+def stop_exit_scoring():
+    global _exit_monitor
+    if _exit_monitor is not None:
+        _exit_monitor.stop()
+        _exit_monitor = None
+    elif _exit_scores is not None:
+        try:
+            _exit_scores.save()
+        except OSError as e:
+            warning(f"Could not save exit scores: {e}")
+
+def show_exit_scores(json_output=False, max_ttfb=MAX_TTFB, min_throughput=MIN_THROUGHPUT, limit=None):
+    report = ExitScores(EXIT_SCORES_FILE, max_ttfb, min_throughput).report(limit)
+    if json_output:
+        print(json.dumps(report))
+        return
+    if not report:
+        log("No exit scores recorded yet. Run with --exit-scoring to collect them.")
+        return
+    for row in report:
+        ttfb = f"{row['ttfb'] * 1000:.0f} ms" if row["ttfb"] is not None else "-"
+        speed = f"{row['throughput'] / 1024:.0f} KB/s" if row["throughput"] is not None else "-"
+        flag = f" {red}slow{reset}" if row["slow"] else ""
+        print(f"{white} {row['fingerprint']}  {green}{ttfb:>8}  {speed:>10}{white}"
+              f"  samples {row['samples']:.1f}  failures {row['failures']:.1f}{flag}{reset}")
+
+def stop_pool():
+    global _pool, _circuit_pool
+    stop_exit_scoring()
+    if _circuit_pool is not None:
+        _circuit_pool.stop()
+        _circuit_pool = None
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
+
 def signal_handler(sig, frame):
+    close_sessions()
+    stop_pool()
     stop_services()
     print(f"\n{white} [{red}!{white}] {red}Program terminated by user.{reset}")
     sys.exit(0)
 
 def check_internet_connection():
+    import requests
     try:
-        response = requests.get('http://www.google.com', timeout=5)
+        response = get_session().get('http://www.google.com', timeout=5)
         return True
     except requests.RequestException:
         error("Internet connection required but not available.", 9)
 
+def initialize_pool(instances, country=None):
+    global _pool
+    try:
+        _pool = TorPool(instances, *_pool_ports, country=country)
+        _pool.start()
+    except (OSError, ValueError) as e:
+        stop_pool()
+        error(f"Could not start Tor pool: {e}", 16)
+    ports = ", ".join(str(instance.socks_port) for instance in _pool)
+    log(f"Started {instances} Tor instances. Please wait for Tor to establish connection.")
+    log(f"Tor SOCKS proxies available on 127.0.0.1 ports: {ports}")
+    return _pool
+
+def initialize_country_pool(countries, idle_timeout, memory_budget):
+    global _pool
+    try:
+        _pool = CountryPool(countries, *_pool_ports, idle_timeout=idle_timeout, memory_budget_mb=memory_budget,
+                            bootstrap_timeout=_bootstrap_timeout)
+        _pool.start()
+    except (OSError, ValueError) as e:
+        stop_pool()
+        error(f"Could not start country pool: {e}", 16)
+    log(f"Rotating across countries: {', '.join(_pool.countries)}. Instances start on first use.")
+    return _pool
+
+def serve_socks(port, policy="connection", every=1, pool=None):
+    import asyncio
+    from .socks_server import RotatingSocksServer, RotationPolicy
+    try:
+        rotation = RotationPolicy(policy, every)
+    except ValueError as e:
+        error(str(e), 19)
+    if pool is not None:
+        upstreams = [("127.0.0.1", instance.socks_port) for instance in pool]
+    else:
+        upstreams = [("127.0.0.1", SOCKS_PORT)]
+    server = RotatingSocksServer(upstreams, port=port, policy=rotation)
+    log(f"Rotating SOCKS5 proxy listening on 127.0.0.1:{port} ({policy} rotation)")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
+    except OSError as e:
+        error(f"Could not start SOCKS5 proxy: {e}", 20)
+    stats = server.stats()
+    log(f"Served {stats['total_connections']} connections, {stats['bytes_up']} bytes up, {stats['bytes_down']} bytes down")
+
 def initialize_environment():
     service_action("start")
     log("Tor service started. Please wait for Tor to establish connection.")
     log("Configure your browser to use Tor proxy (127.0.0.1:9050) for anonymity.")
 
+def ip_status():
+    ip, country_code, country_name = get_ip_with_country(quiet=True)
+    if ip is None:
+        raise ConnectionError("no IP-echo backend answered through Tor")
+    return {"ip": ip, "country_code": country_code, "country_name": country_name}
+
+def get_status_collector():
+    global _status
+    if _status is None:
+        _status = StatusCollector([
+            StatusProbe("tor_installed", lambda: {"tor_installed": is_tor_installed()}, timeout=1, ttl=60),
+            StatusProbe("tor_running", lambda: {"tor_running": is_tor_running()}, timeout=2, ttl=2),
+            StatusProbe("ip", ip_status, timeout=10, ttl=30),
+            StatusProbe("configured_country", lambda: {"configured_country": get_current_country()}, timeout=1, ttl=2),
+            StatusProbe("service_manager", lambda: {"service_manager": detect_service_manager()}, timeout=1, ttl=None),
+            StatusProbe("package_manager", lambda: {"package_manager": detect_package_manager()}, timeout=1, ttl=None),
+            StatusProbe("metrics", lambda: {"metrics": REGISTRY.snapshot()}, timeout=1),
+        ], static={"config_file": CONFIG_FILE, "log_file": LOG_FILE})
+    return _status
+
+def collect_status(on_result=None):
+    return get_status_collector().collect(on_result)
+
+def cached_status():
+    collector = get_status_collector()
+    collector.refresh()
+    return collector.snapshot()
+
+def status_lines(name, status):
+    def mark(key):
+        return '✓' if status.get(key) else '✗'
+
+    if name == "tor_installed":
+        return [f"{white} {cyan}Tor Installed:{reset} {mark('tor_installed')}"]
+    if name == "tor_running":
+        return [f"{white} {cyan}Tor Running:{reset} {mark('tor_running')}"]
+    if name == "ip":
+        if not status.get("ip"):
+            return [f"{white} {cyan}Current IP:{reset} {red}Unknown{reset}"]
+        lines = [f"{white} {cyan}Current IP:{reset} {white}{status['ip']}{reset}"]
+        if status.get("country_code") and status.get("country_name"):
+            lines.append(f"{white} {cyan}IP Country:{reset} {status['country_name']} ({status['country_code']})")
+        return lines
+    if name == "configured_country":
+        return [f"{white} {cyan}Configured Country:{reset} {status.get('configured_country') or 'Unknown'}"]
+    if name == "service_manager":
+        return [f"{white} {cyan}Service Manager:{reset} {status.get('service_manager') or 'Unknown'}"]
+    if name == "package_manager":
+        return [f"{white} {cyan}Package Manager:{reset} {status.get('package_manager') or 'Unknown'}"]
+    return []
+
+STATUS_ORDER = ["tor_installed", "tor_running", "ip", "configured_country", "service_manager", "package_manager"]
+
+def print_status_footer(status):
+    print(f"{white} {cyan}Config File:{reset} {status['config_file']}")
+    print(f"{white} {cyan}Log File:{reset} {status['log_file']}")
+    if status.get("daemon"):
+        print(f"{white} {cyan}Daemon:{reset} pid {status['daemon']['pid']}, up {int(status['daemon']['uptime'])}s")
+    print(f"{white}──────────────────────────────────────────{reset}")
+
+def print_status(status):
+    print(f"{white} ─────────────[{green} TorNet Status {white}]─────────────{reset}")
+    for name in STATUS_ORDER:
+        for line in status_lines(name, status):
+            print(line)
+    print_status_footer(status)
+
 def show_status():
-    tor_installed = is_tor_installed()
-    tor_running = is_tor_running()
-    ip, country_code, country_name = get_ip_with_country()
-    current_country = get_current_country()
-    service_mgr = detect_service_manager()
-    pm = detect_package_manager()
     print(f"{white} ─────────────[{green} TorNet Status {white}]─────────────{reset}")
-    print(f"{white} {cyan}Tor Installed:{reset} {'✓' if tor_installed else '✗'}")
-    print(f"{white} {cyan}Tor Running:{reset} {'✓' if tor_running else '✗'}")
     
-    if ip:
-        print(f"{white} {cyan}Current IP:{reset} {white}{ip}{reset}")
-        if country_code and country_name:
-            print(f"{white} {cyan}IP Country:{reset} {country_name} ({country_code})")
-    else:
-        print(f"{white} {cyan}Current IP:{reset} {red}Unknown{reset}")
+    finished = set()
+    printed = 0
     
-    print(f"{white} {cyan}Configured Country:{reset} {current_country}")
-    print(f"{white} {cyan}Service Manager:{reset} {service_mgr or 'Unknown'}")
-    print(f"{white} {cyan}Package Manager:{reset} {pm or 'Unknown'}")
-    print(f"{white} {cyan}Config File:{reset} {CONFIG_FILE}")
-    print(f"{white} {cyan}Log File:{reset} {LOG_FILE}")
-    print(f"{white}──────────────────────────────────────────{reset}")
+    def on_result(name, status):
+        nonlocal printed
+        finished.add(name)
+        while printed < len(STATUS_ORDER) and STATUS_ORDER[printed] in finished:
+            for line in status_lines(STATUS_ORDER[printed], status):
+                print(line, flush=True)
+            printed += 1
+    
+    status = collect_status(on_result)
+    for name in STATUS_ORDER[printed:]:
+        for line in status_lines(name, status):
+            print(line)
+    print_status_footer(status)
 
-def change_ip_once(country=None, json_output=False):
-    log("Changing IP address...")
-    new_ip = change_ip(country)
-    if new_ip:
-        if json_output:
-            print(json.dumps({"action": "ip_change", "timestamp": time.time(), "ip": new_ip}))
-        else:
-            print_ip(new_ip)
-            log("IP changed successfully!")
-    else:
+def watch_status(interval, json_output=False, use_daemon=True):
+    try:
+        while True:
+            status = forward_to_daemon("status", cached=True) if use_daemon else None
+            status = status or cached_status()
+            if json_output:
+                print(json.dumps({"timestamp": time.time(), **status}), flush=True)
+            else:
+                print("\033[H\033[J", end="")
+                print_status(status)
+                pending = [name for name, probe in status.get("probes", {}).items() if probe["pending"]]
+                if pending:
+                    info(f"Refreshing: {', '.join(pending)}")
+            time.sleep(interval)
+    except KeyboardInterrupt:
+        return
+
+def print_ip_change(new_ip, source, json_output=False, backends=None):
+    if not new_ip:
         if json_output:
             print(json.dumps({"action": "ip_change", "timestamp": time.time(), "error": "Failed to change IP"}))
         else:
             warning("Failed to change IP address")
+        return
+    if json_output:
+        output = {"action": "ip_change", "timestamp": time.time(), "ip": new_ip, "source": source}
+        if backends:
+            output["backends"] = backends
+        print(json.dumps(output), flush=True)
+    else:
+        print_ip(new_ip)
+        log("IP changed successfully!")
+
+def change_ip_once(country=None, json_output=False):
+    log("Changing IP address...")
+    new_ip = change_ip_unique(country)
+    print_ip_change(new_ip, _ip_source, json_output, backends_used())
+    if new_ip:
+        for thread in threading.enumerate():
+            if thread.name.startswith("tornet-verify"):
+                thread.join(CIRCUIT_TIMEOUT)
+        for result in _verifications:
+            if json_output:
+                print(json.dumps({"action": "ip_verify", "timestamp": time.time(), **result}))
+            elif result["match"]:
+                log(f"Verified exit IP {result['actual']}")
+
+def backends_used():
+    return backend_stats() if _ip_source == "echo" else None
+
+def describe_ip(ip):
+    output = {"ip": ip}
+    ip_info = get_ip_info(ip) if ip else None
+    if ip_info and ip_info.get("status") == "success":
+        output.update(ip_info)
+    return output
+
+def use_instance(pool):
+    return pool.acquire("round_robin") if pool is not None else nullcontext()
+
+def daemon_rotate(country=None):
+    with _rotate_lock, use_instance(_pool) as instance:
+        new_ip = change_ip_unique(country, instance)
+        result = {"ip": new_ip, "source": _ip_source, "backends": backends_used()}
+    if instance is not None:
+        result["instance"] = instance.index
+    if new_ip:
+        result["country_code"] = lookup_country(new_ip)
+    return result
+
+def daemon_current_ip(info=False):
+    with use_instance(_pool) as instance:
+        ip = get_current_ip(instance)
+    return describe_ip(ip) if ip and info else {"ip": ip}
+
+def daemon_metrics(server):
+    metrics = server.stats()
+    metrics["registry"] = REGISTRY.snapshot()
+    metrics["ip_backends"] = backend_stats()
+    metrics["verifications"] = list(_verifications)
+    if _history is not None:
+        metrics["exit_reuses"] = _history.reuses
+    if _circuit_pool is not None:
+        metrics["circuit_pool"] = _circuit_pool.metrics()
+    if _exit_scores is not None:
+        metrics["exit_scores"] = {
+            "tracked": len(_exit_scores),
+            "excluded": len(_exit_monitor.excluded or ()) if _exit_monitor is not None else 0,
+            "closed": _exit_monitor.closed if _exit_monitor is not None else 0,
+        }
+    return metrics
+
+def run_daemon(socket_file=SOCKET_FILE):
+    server = DaemonServer({}, socket_file)
+    server.handlers.update({
+        "rotate": daemon_rotate,
+        "current_ip": daemon_current_ip,
+        "status": lambda cached=False: {**(cached_status() if cached else collect_status()), "daemon": server.stats()},
+        "metrics": lambda: daemon_metrics(server),
+    })
+    try:
+        server.bind()
+    except OSError as e:
+        error(f"Could not start daemon: {e}", 21)
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        signal.signal(sig, lambda sig, frame: server.shutdown())
+    record_event("daemon_start", socket=socket_file, pid=os.getpid())
+    log(f"tornet daemon listening on {socket_file}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        close_sessions()
+        stop_pool()
+        record_event("daemon_stop", socket=socket_file, pid=os.getpid())
+        _events.flush()
+        log("tornet daemon stopped")
+
+def forward_to_daemon(command, **params):
+    if not os.path.exists(SOCKET_FILE):
+        return None
+    try:
+        return daemon_request(command, **params)
+    except (FileNotFoundError, ConnectionRefusedError):
+        return None
+    except OSError as e:
+        error(f"tornet daemon did not answer {command!r}: {e or 'timed out'} (use --no-daemon to bypass it)", 21)
+    except DaemonError as e:
+        error(f"tornet daemon: {e}", 21)
 
 def parse_schedule(schedule_str):
     unit = schedule_str[-1].lower()
@@ -448,118 +947,187 @@ def parse_schedule(schedule_str):
         error("Invalid schedule format. Use like '30s', '5m', '2h', '1d'", 12)
 
 def run_scheduled(schedule_str, country=None, json_output=False):
-    interval = parse_schedule(schedule_str)
+    parse_schedule(schedule_str)
     log(f"Scheduled IP change every {schedule_str}")
-    change_ip_repeatedly(str(interval), 0, country, json_output)
+    change_ip_repeatedly(schedule_str, 0, country, json_output)
 
-def dns_leak_test():
-    test_urls = [
-        "https://dnsleaktest.com",
-        "https://ipleak.net",
-        "https://www.dnsleaktest.com"
-    ]
-    print(f"{white}─────────────[{green} DNS Leak Test {white}]─────────────{reset}")
+def dns_leak_test(config=None, json_output=False):
+    from .dnsleak import leak_test, LEAK_TEST_TIMEOUT
+    from .control import ensure_dns_port
+
+    config = config or {}
+    dns_server = config.get("dns_server")
+    if dns_server is None:
+        controller = get_controller()
+        if controller:
+            try:
+                ensure_dns_port(controller, _dns_port)
+            except Exception as e:
+                warning(f"Could not enable Tor's DNSPort: {e}")
     
-    for url in test_urls:
-        try:
-            proxies = {
-                'http': 'socks5://127.0.0.1:9050',
-                'https': 'socks5://127.0.0.1:9050'
-            }
-            response = requests.get(url, proxies=proxies, timeout=10)
-            if response.status_code == 200:
-                print(f"{white} {cyan}{url}:{reset} {green}Accessible via Tor ✓{reset}")
-            else:
-                print(f"{white} {cyan}{url}:{reset} {red}Inaccessible via Tor ✗{reset}")
-        except:
-            print(f"{white} {cyan}{url}:{reset} {red}Failed to connect via Tor ✗{reset}")
+    report = leak_test(config.get("names"), config.get("urls"), dns_server or ("127.0.0.1", _dns_port),
+                       get_session(SOCKS_PORT),
+                       config.get("timeout", LEAK_TEST_TIMEOUT))
+    record_event("dns_leak_test", leak=report["leak"], dns_port_ok=report["dns_port_ok"],
+                 mismatches=report["mismatches"] or None)
+    if json_output:
+        print(json.dumps(report, indent=2))
+        return report
     
+    def mark(ok):
+        return f"{green}✓{reset}" if ok else f"{red}✗{reset}"
+    
+    print(f"{white}─────────────[{green} DNS Leak Test {white}]─────────────{reset}")
+    print(f"{white} {cyan}Tor DNSPort:{reset} {green}{report['dns_server']}{reset}")
+    print(f"{white} {cyan}System resolvers:{reset} {green}{', '.join(report['system_nameservers']) or 'unknown'}{reset}")
+    for result in report["names"]:
+        tor = ", ".join(result["tor"]) if result["tor"] else result["tor_error"]
+        system = ", ".join(result["system"]) if result["system"] else result["system_error"]
+        print(f"{white} {cyan}{result['name']}:{reset} tor {mark(result['tor_error'] is None)} {tor} | "
+              f"system {system}")
+    for result in report["urls"]:
+        print(f"{white} {cyan}{result['url']}:{reset} {mark(result['ok'])} "
+              f"{result['status'] or result['error']} ({result['seconds'] or 0:.2f}s)")
     print(f"{white}──────────────────────────────────────────{reset}")
-    info("For detailed DNS leak test, visit: https://dnsleaktest.com while using Tor")
+    if not report["dns_port_ok"]:
+        warning(f"Tor's DNSPort at {report['dns_server']} did not resolve every test name")
+    if report["leak"]:
+        servers = ", ".join(report["non_tor_nameservers"]) or "the system resolver"
+        warning(f"DNS lookups through {servers} bypass Tor - applications not using Tor for DNS will leak lookups")
+        if report["mismatches"]:
+            warning(f"The system resolver and Tor disagree on: {', '.join(report['mismatches'])}")
+    else:
+        log("No DNS leak detected")
+    info(f"Finished in {report['seconds']:.2f}s")
+    return report
 
 def toggle_kill_switch():
-    iptables = shutil.which("iptables")
-    if not iptables:
-        error("iptables not found. Kill switch requires iptables.", 13)
+    from .killswitch import find_kill_switch, tor_uid, KillSwitchError
+
+    kill_switch = find_kill_switch()
+    if kill_switch is None:
+        error("iptables-restore or nft not found. Kill switch requires iptables or nftables.", 13)
     
     if not is_root():
         error("Kill switch requires root privileges. Run with sudo.", 14)
     
-    cmd = [iptables, "-L"]
-    result = run_cmd(cmd, use_sudo=False, check=False)
+    try:
+        if kill_switch.enabled():
+            kill_switch.disable()
+            record_event("kill_switch", enabled=False, backend=kill_switch.name)
+            log("Kill switch disabled")
+        else:
+            uid = tor_uid()
+            kill_switch.enable(uid)
+            record_event("kill_switch", enabled=True, backend=kill_switch.name, tor_uid=uid)
+            log("Kill switch enabled - All traffic must go through Tor")
+    except KillSwitchError as e:
+        error(f"Could not apply kill switch rules ({kill_switch.name}): {e}", 13)
+
+def parse_time(value):
+    from .scheduler import parse_duration
+
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        return time.time() - parse_duration(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        raise ValueError(f"Invalid time: {value!r} (use epoch seconds, an ISO date or a duration like 15m)")
+
+def format_event(line):
+    try:
+        record = json.loads(line)
+        stamp = datetime.fromtimestamp(record.pop("ts")).strftime("%Y-%m-%d %H:%M:%S")
+        event = record.pop("event")
+    except (ValueError, KeyError, TypeError):
+        return line.rstrip("\n")
+    fields = " ".join(f"{key}={value}" for key, value in record.items() if value is not None)
+    return f"{stamp} {event} {fields}".rstrip()
+
+def follow_logs(follow=False, since=None, until=None, json_output=False):
+    try:
+        since, until = parse_time(since), parse_time(until)
+    except ValueError as e:
+        error(str(e), 15)
     
-    if "TORNET-KILLSWITCH" in result.stdout:
-        cmd = [iptables, "-D", "OUTPUT", "-j", "TORNET-KILLSWITCH"]
-        run_cmd(cmd, use_sudo=False)
-        cmd = [iptables, "-F", "TORNET-KILLSWITCH"]
-        run_cmd(cmd, use_sudo=False)
-        cmd = [iptables, "-X", "TORNET-KILLSWITCH"]
-        run_cmd(cmd, use_sudo=False)
-        log("Kill switch disabled")
-    else:
-        cmd = [iptables, "-N", "TORNET-KILLSWITCH"]
-        run_cmd(cmd, use_sudo=False)
-        cmd = [iptables, "-A", "TORNET-KILLSWITCH", "-d", "127.0.0.1/8", "-j", "ACCEPT"]
-        run_cmd(cmd, use_sudo=False)
-        cmd = [iptables, "-A", "TORNET-KILLSWITCH", "-d", "192.168.0.0/16", "-j", "ACCEPT"]
-        run_cmd(cmd, use_sudo=False)
-        cmd = [iptables, "-A", "TORNET-KILLSWITCH", "-d", "172.16.0.0/12", "-j", "ACCEPT"]
-        run_cmd(cmd, use_sudo=False)
-        cmd = [iptables, "-A", "TORNET-KILLSWITCH", "-d", "10.0.0.0/8", "-j", "ACCEPT"]
-        run_cmd(cmd, use_sudo=False)
-        cmd = [iptables, "-A", "TORNET-KILLSWITCH", "-p", "tcp", "--dport", "9050", "-j", "ACCEPT"]
-        run_cmd(cmd, use_sudo=False)
-        cmd = [iptables, "-A", "TORNET-KILLSWITCH", "-j", "DROP"]
-        run_cmd(cmd, use_sudo=False)
-        cmd = [iptables, "-A", "OUTPUT", "-j", "TORNET-KILLSWITCH"]
-        run_cmd(cmd, use_sudo=False)
-        log("Kill switch enabled - All traffic must go through Tor")
-
-def follow_logs(follow=False):
-    log_dir = os.path.dirname(LOG_FILE)
-    os.makedirs(log_dir, exist_ok=True)
+    def show(line):
+        print(line.rstrip("\n") if json_output else format_event(line), flush=follow)
     
-    if not os.path.exists(LOG_FILE):
-        with open(LOG_FILE, "w") as f:
-            f.write(f"TorNet Log File - Created {datetime.now()}\n")
+    try:
+        empty = True
+        for line in read_range(LOG_FILE, since, until):
+            show(line)
+            empty = False
+        if follow:
+            for line in follow_file(LOG_FILE):
+                show(line)
+        elif empty and not json_output:
+            log("No events logged" + (" in that range" if since or until else ""))
+    except KeyboardInterrupt:
+        return
+    except OSError as e:
+        error(f"Could not read log file: {e}", 15)
+
+def apply_settings(settings, old=None, changed=None):
+    global _dns_port, _pool_ports
+    if old is None:
+        _dns_port = settings.dns_port
+        _pool_ports = (settings.pool_socks_port, settings.pool_control_port)
+        if settings.backends:
+            set_backends(settings.backends)
+        return
     
-    if follow:
-        try:
-            with open(LOG_FILE, "r") as f:
-                f.seek(0, 2)
-                while True:
-                    line = f.readline()
-                    if line:
-                        print(line.strip())
-                    else:
-                        time.sleep(0.1)
-        except KeyboardInterrupt:
-            return
-    else:
-        try:
-            with open(LOG_FILE, "r") as f:
-                content = f.read()
-                if content:
-                    print(content)
-                else:
-                    log("Log file is empty")
-        except Exception as e:
-            error(f"Could not read log file: {e}", 15)
+    record_event("config_reload", changed=changed)
+    log(f"Config reloaded ({', '.join(changed)} changed)")
+    if "backends" in changed:
+        set_backends(settings.backends or [])
+    if "dns_port" in changed:
+        _dns_port = settings.dns_port
+        controller = get_controller()
+        if controller:
+            try:
+                controller.set_conf("DNSPort", f"127.0.0.1:{_dns_port}")
+            except Exception as e:
+                warning(f"Could not move Tor's DNSPort to {_dns_port}: {e}")
+    if "instances" in changed:
+        if isinstance(_pool, TorPool):
+            try:
+                added, removed = _pool.resize(settings.instances, _bootstrap_timeout)
+                log(f"Tor pool resized to {settings.instances} instances (+{len(added)}/-{len(removed)})")
+            except (OSError, ValueError, TimeoutError) as e:
+                warning(f"Could not resize the Tor pool: {e}")
+        elif not isinstance(_pool, CountryPool):
+            warning("Switching between a single Tor and a pool of instances takes effect after a restart")
+    if "countries" in changed:
+        if isinstance(_pool, CountryPool) and settings.countries:
+            added, removed = _pool.set_countries(settings.countries)
+            log(f"Rotating across countries: {', '.join(_pool.countries)}")
+        else:
+            warning("Switching to or from per-country instances takes effect after a restart")
+    pending = [FIELDS_BY_NAME[name].key for name in changed if not FIELDS_BY_NAME[name].live]
+    if pending:
+        warning(f"{', '.join(pending)} take effect after a restart")
+
+def watch_config(config_file, settings, overrides=None):
+    watcher = ConfigWatcher(config_file, settings, overrides,
+                            on_error=lambda e: warning(f"Config reload failed, keeping previous settings: {e}"))
+    watcher.subscribe(lambda old, new, changed: apply_settings(new, old, changed))
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda sig, frame: watcher.request_reload())
+    return watcher.start()
 
 def load_config(config_file):
-    if not os.path.exists(config_file):
-        return {}
-    
     try:
-        with open(config_file, "r") as f:
-            if config_file.endswith(".yml") or config_file.endswith(".yaml"):
-                return yaml.safe_load(f) or {}
-            elif config_file.endswith(".json"):
-                return json.load(f)
-            else:
-                warning(f"Unsupported config format: {config_file}")
-                return {}
-    except Exception as e:
+        return read_config(config_file)
+    except (OSError, ConfigError) as e:
         warning(f"Could not load config file: {e}")
         return {}
 
@@ -568,6 +1136,7 @@ def save_config(config_file, config):
     try:
         with open(config_file, "w") as f:
             if config_file.endswith(".yml") or config_file.endswith(".yaml"):
+                import yaml
                 yaml.dump(config, f, default_flow_style=False)
             elif config_file.endswith(".json"):
                 json.dump(config, f, indent=2)
@@ -576,8 +1145,11 @@ def save_config(config_file, config):
         warning(f"Could not save config: {e}")
 
 def get_ip_info(ip):
+    country_code = lookup_country(ip)
+    if country_code:
+        return {"status": "success", "countryCode": country_code, "country": get_country_name(country_code)}
     try:
-        response = requests.get(f"http://ip-api.com/json/{ip}", timeout=5)
+        response = get_session().get(f"http://ip-api.com/json/{ip}", timeout=5)
         if response.status_code == 200:
             return response.json()
     except:
@@ -659,29 +1231,86 @@ def main():
     signal.signal(signal.SIGQUIT, signal_handler)
 
     parser = argparse.ArgumentParser(description="TorNet - Automate IP address changes using Tor")
-    parser.add_argument('--interval', type=str, default='60', help='Time in seconds between IP changes (or range like "30-120")')
-    parser.add_argument('--count', type=int, default=10, help='Number of times to change IP. If 0, change IP indefinitely')
+    parser.add_argument('--interval', type=str, help='Time in seconds between IP changes (or range like "30-120"; default 60)')
+    parser.add_argument('--count', type=int, help='Number of times to change IP. If 0, change IP indefinitely (default 10)')
     parser.add_argument('--ip', action='store_true', help='Display current IP address and exit')
     parser.add_argument('--auto-fix', action='store_true', help='Automatically install missing dependencies')
     parser.add_argument('--stop', action='store_true', help='Stop all Tor services and tornet processes')
     parser.add_argument('--version', action='version', version=f'%(prog)s {VERSION}')
     parser.add_argument('--status', action='store_true', help='Show current status')
+    parser.add_argument('--watch', type=float, nargs='?', const=2.0, metavar='SECONDS', help='Refresh --status every SECONDS (default 2) from cached probe results')
     parser.add_argument('--change', action='store_true', help='Change IP once')
     parser.add_argument('--country', type=str, help='Use specific country exit nodes (e.g., "us", "de", "jp", "auto")')
+    parser.add_argument('--persist-country', action='store_true', help='Also write the selected country to the custom torrc')
+    parser.add_argument('--verify-ip', action='store_true', help='Confirm the exit IP reported by Tor with an external check in the background')
+    parser.add_argument('--unique-window', type=int, default=HISTORY_WINDOW, help='Re-rotate when the exit IP was one of the last N used (0 disables)')
+    parser.add_argument('--unique-retries', type=int, default=UNIQUE_RETRIES, help='Extra rotations allowed to avoid a recently used exit')
+    parser.add_argument('--persist-history', action='store_true', help='Remember recent exit IPs across runs')
     parser.add_argument('--schedule', type=str, help='Schedule IP changes (e.g., "30s", "5m", "2h", "1d")')
     parser.add_argument('--dns-leak-test', action='store_true', help='Test for DNS leaks')
     parser.add_argument('--kill-switch', action='store_true', help='Toggle kill switch')
     parser.add_argument('--log', action='store_true', help='Show log file')
     parser.add_argument('--follow', action='store_true', help='Follow log file (use with --log)')
+    parser.add_argument('--since', type=str, help='Show events from this time: epoch, ISO date or age like "15m" (use with --log)')
+    parser.add_argument('--until', type=str, help='Show events up to this time (use with --log)')
     parser.add_argument('--json', action='store_true', help='Output in JSON format')
     parser.add_argument('--config', type=str, help='Use custom config file')
     parser.add_argument('--list-countries', action='store_true', help='List available country codes')
     parser.add_argument('--restore-default', action='store_true', help='Restore default Tor configuration')
+    parser.add_argument('--pool-size', type=int, help='Number of keep-alive connections kept per proxy endpoint')
+    parser.add_argument('--bootstrap-timeout', type=int, default=BOOTSTRAP_TIMEOUT, help='Seconds to wait for Tor to finish bootstrapping')
+    parser.add_argument('--serve-socks', type=int, metavar='PORT', help='Run a local rotating SOCKS5 proxy on PORT')
+    parser.add_argument('--rotate-policy', choices=['connection', 'requests', 'time'], default='connection', help='When the SOCKS5 proxy switches circuits (use with --serve-socks)')
+    parser.add_argument('--rotate-every', type=float, default=1, help='Connections (requests policy) or seconds (time policy) per circuit')
+    parser.add_argument('--circuit-pool', type=int, default=0, metavar='K', help='Keep K pre-built circuits ready so rotations are instant')
+    parser.add_argument('--countries', type=str, help='Rotate across warm per-country Tor instances (e.g., "US,DE,NL")')
+    parser.add_argument('--idle-timeout', type=int, default=600, help='Seconds before an unused per-country instance is stopped')
+    parser.add_argument('--memory-budget', type=int, default=512, help='Memory budget in MB for per-country instances')
+    parser.add_argument('--instances', type=int, help='Number of Tor instances to run, each with its own SocksPort')
+    parser.add_argument('--daemon', action='store_true', help=f'Keep Tor, sessions and pools warm and serve a control API on {SOCKET_FILE}')
+    parser.add_argument('--metrics-port', type=int, metavar='PORT', help='Serve Prometheus metrics on 127.0.0.1:PORT/metrics')
+    parser.add_argument('--exit-scoring', action='store_true', help='Score exit relays by latency and throughput and avoid slow ones')
+    parser.add_argument('--exit-probe', type=str, metavar='URL', help='Download URL after each rotation to measure exit throughput (use with --exit-scoring)')
+    parser.add_argument('--max-exit-ttfb', type=float, default=MAX_TTFB, metavar='SECONDS', help=f'Treat exits slower than this to first byte as slow (default {MAX_TTFB:g})')
+    parser.add_argument('--min-exit-speed', type=float, default=MIN_THROUGHPUT / 1024, metavar='KBPS', help=f'Treat exits below this throughput in KB/s as slow (default {MIN_THROUGHPUT // 1024})')
+    parser.add_argument('--exit-scores', action='store_true', help='Show recorded exit relay scores and exit')
+    parser.add_argument('--no-daemon', action='store_true', help='Run --change/--ip/--status locally even if a daemon is running')
     
     args = parser.parse_args()
 
+    global _bootstrap_timeout, _persist_country, _verify_ip, _history, _unique_retries, _json_output
+    _json_output = args.json
+    _bootstrap_timeout = args.bootstrap_timeout
+    _persist_country = args.persist_country
+    _verify_ip = args.verify_ip
+    _unique_retries = args.unique_retries
+    if args.unique_window > 0:
+        _history = ExitHistory(args.unique_window, HISTORY_FILE if args.persist_history else None)
+
     config_file = args.config or CONFIG_FILE
     config = load_config(config_file)
+    overrides = {name: getattr(args, name) for name in ("interval", "count", "country", "countries", "instances")}
+    try:
+        settings = parse_settings(config, overrides)
+    except ConfigError as e:
+        error(f"Invalid config {config_file}: {e}", 23)
+    for message in settings.warnings if not args.json else ():
+        warning(f"{config_file}: {message}")
+    apply_settings(settings)
+    args.interval, args.count, args.country = settings.interval, settings.count, settings.country
+    args.countries, args.instances = settings.countries, settings.instances
+
+    if args.metrics_port:
+        try:
+            serve_metrics(args.metrics_port)
+        except OSError as e:
+            error(f"Could not start metrics endpoint: {e}", 22)
+
+    if args.pool_size:
+        try:
+            set_pool_size(args.pool_size)
+        except ValueError as e:
+            error(str(e), 17)
 
     if args.stop:
         stop_services()
@@ -695,29 +1324,49 @@ def main():
         list_countries()
         return
 
+    if args.exit_scores:
+        show_exit_scores(args.json, args.max_exit_ttfb, args.min_exit_speed * 1024)
+        return
+
+    use_daemon = not (args.no_daemon or args.daemon)
+
     if args.status:
-        show_status()
+        if args.watch:
+            watch_status(args.watch, args.json, use_daemon)
+            return
+        status = forward_to_daemon("status") if use_daemon else None
+        if status is not None and not args.json:
+            print_status(status)
+        elif status is not None:
+            print(json.dumps(status))
+        elif args.json:
+            print(json.dumps(collect_status()))
+        else:
+            show_status()
         return
 
     if args.ip:
-        ip = get_current_ip()
-        if ip:
+        output = forward_to_daemon("current_ip", info=args.json) if use_daemon else None
+        if output is None:
+            ip = get_current_ip()
+            output = describe_ip(ip) if ip and args.json else {"ip": ip}
+        if output["ip"]:
             if args.json:
-                ip_info = get_ip_info(ip)
-                output = {"ip": ip}
-                if ip_info and ip_info.get("status") == "success":
-                    output.update(ip_info)
                 print(json.dumps(output))
             else:
-                print_ip(ip)
+                print_ip(output["ip"])
         return
 
     if args.change:
-        change_ip_once(args.country, args.json)
+        result = forward_to_daemon("rotate", country=args.country) if use_daemon else None
+        if result is not None:
+            print_ip_change(result["ip"], result["source"], args.json, result.get("backends"))
+        else:
+            change_ip_once(args.country, args.json)
         return
 
     if args.dns_leak_test:
-        dns_leak_test()
+        dns_leak_test(config.get("dns_leak_test"), args.json)
         return
 
     if args.kill_switch:
@@ -725,7 +1374,7 @@ def main():
         return
 
     if args.log:
-        follow_logs(args.follow)
+        follow_logs(args.follow, args.since, args.until, args.json)
         return
 
     if args.schedule:
@@ -749,11 +1398,44 @@ def main():
     if not args.json:
         print_banner()
     
-    initialize_environment()
-    
-    time.sleep(5)
+    if args.daemon and args.serve_socks:
+        error("--daemon cannot be combined with --serve-socks", 21)
+
+    if args.countries:
+        if args.serve_socks:
+            error("--countries cannot be combined with --serve-socks", 19)
+        pool = initialize_country_pool(args.countries, args.idle_timeout, args.memory_budget)
+    elif args.instances > 1:
+        pool = initialize_pool(args.instances, args.country)
+        try:
+            pool.wait_until_ready(_bootstrap_timeout)
+        except TimeoutError as e:
+            stop_pool()
+            error(str(e), 18)
+    else:
+        pool = None
+        initialize_environment()
+        wait_for_tor()
+    log("Tor is ready.")
+
+    if args.exit_scoring and pool is None:
+        start_exit_scoring(args.max_exit_ttfb, args.min_exit_speed * 1024, args.exit_probe)
+    elif args.exit_scoring:
+        warning("--exit-scoring applies to the main Tor instance and is ignored with --instances/--countries.")
+    if args.circuit_pool > 0 and pool is None:
+        start_circuit_pool(args.circuit_pool)
     
-    change_ip_repeatedly(args.interval, args.count, args.country, args.json)
+    watcher = watch_config(config_file, settings, overrides)
+    try:
+        if args.daemon:
+            run_daemon()
+        elif args.serve_socks:
+            serve_socks(args.serve_socks, args.rotate_policy, args.rotate_every, pool)
+        else:
+            change_ip_repeatedly(args.interval, args.count, args.country, args.json, pool, watcher)
+    finally:
+        watcher.stop()
+        stop_pool()
 
 if __name__ == "__main__":
     main()